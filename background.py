@@ -0,0 +1,112 @@
+import pygame
+from utils import BLACK, load_texture
+
+# --- Background Parallax ---
+# Scroll speed of each layer as a fraction of the camera's.
+NEBULA_SPEED = 0.1
+STAR_SPEEDS = [0.1, 0.2, 0.35, 0.5]
+# Neighbouring layers whose speeds are at most this far apart are merged into
+# one layer moving at the speed of the first; equal speeds merge without any
+# visible change.
+MERGE_TOLERANCE = 0.05
+
+
+class _Layer:
+    def __init__(self, surface, speed, premultiplied=False):
+        self.surface = surface
+        self.speed = speed
+        self.premultiplied = premultiplied
+
+    def offsets(self, camera_y):
+        """The y of the two tiles covering the screen, as whole pixels like blit would use."""
+        height = self.surface.get_height()
+        y = (-camera_y * self.speed) % height
+        return int(y - height), int(y)
+
+    def draw(self, surface, offsets):
+        flags = pygame.BLEND_PREMULTIPLIED if self.premultiplied else 0
+        for y in offsets:
+            surface.blit(self.surface, (0, y), special_flags=flags)
+
+
+class ParallaxBackground:
+    """
+    The tiled nebula and star layers behind the course.
+    The nebula is flattened onto black once, so it is an opaque surface in
+    the display's format and blits without any blending. Star layers that
+    scroll at (nearly) the same speed as the layer below are composited into
+    it up front. While the camera doesn't move, e.g. during the countdown or
+    on the winner screen, the finished background is kept and redrawn with a
+    single opaque blit.
+    """
+
+    def __init__(self, nebula, star_layers, nebula_speed=NEBULA_SPEED, star_speeds=STAR_SPEEDS,
+                 merge_tolerance=MERGE_TOLERANCE):
+        converted = pygame.display.get_surface() is not None
+        self.layers = []
+        if nebula:
+            flat = pygame.Surface(nebula.get_size())
+            flat.fill(BLACK)
+            flat.blit(nebula, (0, 0))
+            self.layers.append(_Layer(flat.convert() if converted else flat, nebula_speed))
+
+        for stars, speed in zip(star_layers, star_speeds):
+            if not stars:
+                continue
+            below = self.layers[-1] if self.layers else None
+            if (below is None or abs(below.speed - speed) > merge_tolerance
+                    or below.surface.get_size() != stars.get_size()):
+                self.layers.append(_Layer(stars, speed))
+                continue
+            merged = below.surface.copy()
+            if below.surface.get_flags() & pygame.SRCALPHA:
+                # Stacking two transparent layers only composites exactly in premultiplied alpha.
+                if not below.premultiplied:
+                    merged = merged.premul_alpha()
+                merged.blit(stars.premul_alpha(), (0, 0), special_flags=pygame.BLEND_PREMULTIPLIED)
+                below.premultiplied = True
+            else:
+                merged.blit(stars, (0, 0))
+            below.surface = merged
+
+        self._cache = None
+        self._cache_key = None
+        self._last_key = None
+
+    def draw(self, surface, camera_y):
+        """Draws the background for the given camera position."""
+        offsets = [layer.offsets(camera_y) for layer in self.layers]
+        key = (surface.get_size(), tuple(offsets))
+        if key == self._cache_key:
+            surface.blit(self._cache, (0, 0))
+            return
+
+        if key != self._last_key:
+            self._last_key = key
+            for layer, layer_offsets in zip(self.layers, offsets):
+                layer.draw(surface, layer_offsets)
+            return
+
+        # Second frame in a row at the same spot: keep the result around.
+        if self._cache is None or self._cache.get_size() != surface.get_size():
+            self._cache = pygame.Surface(surface.get_size())
+            if pygame.display.get_surface() is not None:
+                self._cache = self._cache.convert()
+        self._cache.fill(BLACK)
+        for layer, layer_offsets in zip(self.layers, offsets):
+            layer.draw(self._cache, layer_offsets)
+        self._cache_key = key
+        surface.blit(self._cache, (0, 0))
+
+
+def load_background():
+    """Loads the nebula backdrop and the star layers drawn over it."""
+    return ParallaxBackground(
+        load_texture('Nebula Aqua-Pink.png'),
+        [
+            load_texture('Stars Small_1.png'),
+            load_texture('Stars Small_2.png'),
+            load_texture('Stars-Big_1_1_PC.png'),
+            load_texture('Stars-Big_1_2_PC.png'),
+        ],
+    )
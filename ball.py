@@ -1,8 +1,52 @@
 import pygame
-import random
+import rng
 import math
+import weakref
+from sweep import SAFE_TRAVEL, MAX_SUBSTEP_TRAVEL, MAX_SUBSTEPS, sweep_move
 from utils import GRAVITY, FRICTION, BALL_RADIUS, SCREEN_WIDTH, WHITE
-from particle import Particle
+
+# A ball resting on the course on its own does not stop dead: it settles into
+# an exact cycle of a few states (bouncing on a ramp by a fraction of a
+# pixel). Once a ball has gone SLEEP_TICKS ticks without touching another
+# ball and its state repeats with a period of at most MAX_SLEEP_PERIOD ticks,
+# it is put to sleep and simply replays that cycle, which gives bit-for-bit
+# the same positions as integrating it. Any contact with another ball wakes it.
+SLEEP_TICKS = 60
+MAX_SLEEP_PERIOD = 6
+DEFAULT_BALL_COLOR = (200, 200, 200)
+
+# Baked sprites by skin surface; skins shared by several users share one
+# sprite, and sprites go away with their skins when a race is reloaded.
+_sprites = weakref.WeakKeyDictionary()
+# Unskinned balls all share one grey sprite per radius.
+_default_sprites = {}
+
+
+def ball_sprite(skin, radius=BALL_RADIUS):
+    """
+    The skin with its white outline baked in, as one surface to blit with its
+    top left corner radius + 1 up and left of the ball's centre.
+    """
+    cache, key = (_default_sprites, radius) if skin is None else (_sprites, skin)
+    sprite = cache.get(key)
+    if sprite is None:
+        size = (radius + 1) * 2
+        sprite = pygame.Surface((size, size), pygame.SRCALPHA)
+        pygame.draw.circle(sprite, WHITE, (radius + 1, radius + 1), radius + 1)
+        if skin is None:
+            pygame.draw.circle(sprite, DEFAULT_BALL_COLOR, (radius + 1, radius + 1), radius)
+        else:
+            sprite.blit(skin, (1, 1))
+        cache[key] = sprite
+    return sprite
+
+
+def draw_balls(surface, balls, camera_y):
+    """Draws balls (e.g. the visible ones from culling.visible) with one batched blit."""
+    surface.blits([
+        (ball.sprite(), (int(ball.x) - ball.radius - 1, int(ball.y - camera_y) - ball.radius - 1))
+        for ball in balls
+    ], doreturn=False)
 
 
 class Ball:
@@ -12,34 +56,46 @@ class Ball:
         self.x = x
         self.y = y
         self.radius = BALL_RADIUS
-        self.vx = random.uniform(-2, 2)
-        self.vy = random.uniform(-5, 0)
+        self.vx = rng.stream('spawn').uniform(-2, 2)
+        self.vy = rng.stream('spawn').uniform(-5, 0)
         self.mass = 1.0
 
+        # Sleeping balls replay their resting cycle instead of being
+        # integrated, and retired ones (past the finish line) are skipped for good.
+        self.asleep = False
+        self.retired = False
+        self.touched = False
+        self.calm_ticks = 0
+        self._trail = []
+        self._cycle = None
+        self._phase = 0
+
         # Unpack skin info
         if skin_info:
             self.skin = skin_info['surface']
             self.username = skin_info['username']
         else:
             self.skin = None
-            self.username = f"Ball {random.randint(100, 999)}"
+            self.username = f"Ball {rng.stream('spawn').randint(100, 999)}"
 
         if self.skin:
             self.mask = pygame.mask.from_surface(self.skin)
         else:
             self.mask = pygame.mask.Mask((self.radius * 2, self.radius * 2), True)
+        # Baked on first draw, so headless races never build any.
+        self._sprite = None
 
-    def update(self, obstacles, ramps):
-        self.vy += GRAVITY
-        self.x += self.vx
-        self.y += self.vy
+    def update(self, obstacles, ramps, map_index=None, dt=1.0):
+        """One explicit Euler step of dt frames, then discrete collision tests."""
+        self.vy += GRAVITY * dt
+        self.x += self.vx * dt
+        self.y += self.vy * dt
 
-        if self.x - self.radius < 0:
-            self.x = self.radius
-            self.vx *= -FRICTION
-        elif self.x + self.radius > SCREEN_WIDTH:
-            self.x = SCREEN_WIDTH - self.radius
-            self.vx *= -FRICTION
+        self._bounce_off_walls()
+
+        # With an index only the geometry around the ball is tested.
+        if map_index is not None:
+            obstacles, ramps = map_index.query(self.y)
 
         for obstacle in obstacles:
             obstacle.collide_with_ball(self)
@@ -47,14 +103,99 @@ class Ball:
         for ramp in ramps:
             ramp.collide_with_ball(self)
 
-    def collide_with_ball(self, other_ball, particles):
+    def update_adaptive(self, obstacles, ramps, map_index=None, dt=1.0):
+        """
+        Steps dt frames without tunnelling through thin geometry.
+        A ball slow enough to be caught by the discrete test takes one plain
+        update. A faster one is split into substeps, and each substep is swept
+        against the ramps and obstacles for the exact time of impact.
+        """
+        travel = math.hypot(self.vx, self.vy + GRAVITY * dt) * dt
+        if travel <= SAFE_TRAVEL:
+            self.update(obstacles, ramps, map_index, dt)
+            return
+
+        substeps = min(MAX_SUBSTEPS, math.ceil(travel / MAX_SUBSTEP_TRAVEL))
+        step = dt / substeps
+        for _ in range(substeps):
+            self.vy += GRAVITY * step
+            nearby_obstacles, nearby_ramps = obstacles, ramps
+            if map_index is not None:
+                nearby_obstacles, nearby_ramps = map_index.query_range(self.y, self.y + self.vy * step)
+            sweep_move(self, nearby_obstacles, nearby_ramps, step)
+            self._bounce_off_walls()
+
+            # Resting and sliding contacts are still resolved by overlap.
+            if map_index is not None:
+                nearby_obstacles, nearby_ramps = map_index.query(self.y)
+            for obstacle in nearby_obstacles:
+                obstacle.collide_with_ball(self)
+            for ramp in nearby_ramps:
+                ramp.collide_with_ball(self)
+
+    def _bounce_off_walls(self):
+        if self.x - self.radius < 0:
+            self.x = self.radius
+            self.vx *= -FRICTION
+        elif self.x + self.radius > SCREEN_WIDTH:
+            self.x = SCREEN_WIDTH - self.radius
+            self.vx *= -FRICTION
+
+    @property
+    def sleep_period(self):
+        """Length of the resting cycle a sleeping ball replays, or 0 when awake."""
+        return len(self._cycle) if self._cycle else 0
+
+    def settle(self):
+        """
+        Called once per tick after collisions; puts the ball to sleep once it
+        has gone long enough without touching another ball and its state has
+        started repeating.
+        """
+        if self.touched:
+            self.calm_ticks = 0
+            self._trail.clear()
+            return
+        self.calm_ticks += 1
+        state = (self.x, self.y, self.vx, self.vy)
+        self._trail.append(state)
+        if len(self._trail) > MAX_SLEEP_PERIOD + 1:
+            del self._trail[0]
+        if self.calm_ticks < SLEEP_TICKS:
+            return
+        for period in range(1, len(self._trail)):
+            if self._trail[-1 - period] == state:
+                self.asleep = True
+                self._cycle = self._trail[-period:]
+                self._phase = 0
+                return
+
+    def replay_rest(self):
+        """Advances a sleeping ball one tick along its resting cycle."""
+        self.x, self.y, self.vx, self.vy = self._cycle[self._phase]
+        self._phase = (self._phase + 1) % len(self._cycle)
+
+    def wake(self):
+        self.asleep = False
+        self.calm_ticks = 0
+        self._trail.clear()
+        self._cycle = None
+
+    def retire(self):
+        """Takes the ball out of the physics for good; it is still ranked and drawn."""
+        self.wake()
+        self.retired = True
+
+    def collide_with_ball(self, other_ball, particles=None):
+        """Resolves an elastic contact with other_ball. Returns whether the two were touching."""
         dx = other_ball.x - self.x
         dy = other_ball.y - self.y
         distance = math.hypot(dx, dy)
 
         if distance < self.radius + other_ball.radius and distance > 0:
-            for _ in range(random.randint(1, 5)):
-                particles.append(Particle((self.x + other_ball.x) / 2, (self.y + other_ball.y) / 2))
+            if particles is not None:
+                particles.emit((self.x + other_ball.x) / 2, (self.y + other_ball.y) / 2,
+                               rng.stream('particles').randint(1, 5))
 
             nx, ny = dx / distance, dy / distance
             tx, ty = -ny, nx
@@ -78,13 +219,14 @@ class Ball:
             self.y -= overlap * ny
             other_ball.x += overlap * nx
             other_ball.y += overlap * ny
+            return True
+        return False
 
-    def draw(self, surface, camera_y):
-        center_pos = (int(self.x), int(self.y - camera_y))
-        pygame.draw.circle(surface, WHITE, center_pos, self.radius + 1)
+    def sprite(self):
+        if self._sprite is None:
+            self._sprite = ball_sprite(self.skin, self.radius)
+        return self._sprite
 
-        if self.skin:
-            draw_pos = (self.x - self.radius, self.y - self.radius - camera_y)
-            surface.blit(self.skin, draw_pos)
-        else:
-            pygame.draw.circle(surface, (200, 200, 200), center_pos, self.radius)
+    def draw(self, surface, camera_y):
+        """Draws this ball alone; draw_balls draws a whole field in one call."""
+        surface.blit(self.sprite(), (int(self.x) - self.radius - 1, int(self.y - camera_y) - self.radius - 1))
@@ -0,0 +1,170 @@
+import numpy
+from ball import Ball
+from narrowphase import resolve_rect_pairs, resolve_segment_pairs
+from utils import GRAVITY, FRICTION, SCREEN_WIDTH
+
+
+class BallField:
+    """
+    Struct-of-arrays physics state for the whole field of balls.
+    Positions and velocities live in contiguous NumPy arrays so gravity,
+    integration and wall bounces are a handful of vectorized operations
+    instead of one Python call per ball.
+    """
+
+    def __init__(self, balls, dtype=numpy.float64):
+        self.dtype = numpy.dtype(dtype)
+        self.x = numpy.array([b.x for b in balls], dtype=self.dtype)
+        self.y = numpy.array([b.y for b in balls], dtype=self.dtype)
+        self.vx = numpy.array([b.vx for b in balls], dtype=self.dtype)
+        self.vy = numpy.array([b.vy for b in balls], dtype=self.dtype)
+        self.radius = numpy.array([b.radius for b in balls], dtype=self.dtype)
+        # Balls that are neither asleep nor retired; only these are integrated.
+        self.active = numpy.ones(len(balls), dtype=bool)
+
+        # The Ball objects handed out from here only hold skin and name; their
+        # x/y/vx/vy read and write straight through to the arrays above.
+        self.balls = [FieldBall(self, i, b) for i, b in enumerate(balls)]
+
+    def __len__(self):
+        return len(self.balls)
+
+    def step(self, obstacles=(), ramps=(), map_index=None):
+        """Advances every active ball by one tick, exactly like Ball.update."""
+        gravity = self.dtype.type(GRAVITY)
+        friction = self.dtype.type(FRICTION)
+        active = numpy.flatnonzero(self.active)
+
+        self.vy[active] += gravity
+        self.x[active] += self.vx[active]
+        self.y[active] += self.vy[active]
+
+        x = self.x[active]
+        radius = self.radius[active]
+        left = active[x - radius < 0]
+        self.x[left] = self.radius[left]
+        self.vx[left] *= -friction
+
+        right = active[x + radius > SCREEN_WIDTH]
+        self.x[right] = SCREEN_WIDTH - self.radius[right]
+        self.vx[right] *= -friction
+
+        # With an index, geometry contacts are resolved by the batched kernels,
+        # obstacles first and then ramps just like Ball.update.
+        if map_index is not None:
+            rect_pairs, seg_pairs = map_index.candidate_pairs(self.y)
+            resolve_rect_pairs(self, *_active_pairs(self.active, *rect_pairs), map_index.geometry)
+            resolve_segment_pairs(self, *_active_pairs(self.active, *seg_pairs), map_index.geometry)
+            return
+
+        for i in active:
+            ball = self.balls[i]
+            for obstacle in obstacles:
+                obstacle.collide_with_ball(ball)
+            for ramp in ramps:
+                ramp.collide_with_ball(ball)
+
+    def crossed(self, finish_y):
+        """Returns the indices of the balls whose bottom edge is past finish_y."""
+        return numpy.flatnonzero(self.y + self.radius > finish_y)
+
+    def leader(self):
+        """Returns the ball furthest down the course."""
+        return self.balls[int(numpy.argmax(self.y))]
+
+
+def _active_pairs(active, ball_idx, geometry_idx):
+    """Drops the candidate pairs of sleeping and retired balls, keeping the order."""
+    keep = active[ball_idx]
+    return ball_idx[keep], geometry_idx[keep]
+
+
+class FieldBall:
+    """
+    Thin view onto one slot of a BallField. It has the same attributes and
+    race methods as Ball, so step_physics, the ranking, replays and drawing
+    work on it unchanged.
+    """
+
+    def __init__(self, field, index, ball):
+        self.field = field
+        self.index = index
+        self.mass = ball.mass
+        self.skin = ball.skin
+        self.username = ball.username
+        self.mask = ball.mask
+        self._sprite = None
+
+        self._asleep = ball.asleep
+        self._retired = ball.retired
+        self.touched = ball.touched
+        self.calm_ticks = ball.calm_ticks
+        self._trail = list(ball._trail)
+        self._cycle = ball._cycle
+        self._phase = ball._phase
+        field.active[index] = not (ball.asleep or ball.retired)
+
+    @property
+    def asleep(self):
+        return self._asleep
+
+    @asleep.setter
+    def asleep(self, value):
+        self._asleep = value
+        self.field.active[self.index] = not (value or self._retired)
+
+    @property
+    def retired(self):
+        return self._retired
+
+    @retired.setter
+    def retired(self, value):
+        self._retired = value
+        self.field.active[self.index] = not (value or self._asleep)
+
+    @property
+    def x(self):
+        return float(self.field.x[self.index])
+
+    @x.setter
+    def x(self, value):
+        self.field.x[self.index] = value
+
+    @property
+    def y(self):
+        return float(self.field.y[self.index])
+
+    @y.setter
+    def y(self, value):
+        self.field.y[self.index] = value
+
+    @property
+    def vx(self):
+        return float(self.field.vx[self.index])
+
+    @vx.setter
+    def vx(self, value):
+        self.field.vx[self.index] = value
+
+    @property
+    def vy(self):
+        return float(self.field.vy[self.index])
+
+    @vy.setter
+    def vy(self, value):
+        self.field.vy[self.index] = value
+
+    @property
+    def radius(self):
+        return int(self.field.radius[self.index])
+
+    # Sleeping, collision response and drawing are shared with the
+    # object-per-ball engine.
+    sleep_period = Ball.sleep_period
+    settle = Ball.settle
+    replay_rest = Ball.replay_rest
+    wake = Ball.wake
+    retire = Ball.retire
+    collide_with_ball = Ball.collide_with_ball
+    sprite = Ball.sprite
+    draw = Ball.draw
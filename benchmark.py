@@ -0,0 +1,291 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+import numpy
+import pygame
+import rng
+from ball import Ball, draw_balls
+from ball_field import BallField
+from map_compiler import load_compiled_map
+from map_index import MapIndex
+from particle import ParticlePool
+from race import step_physics
+from ranking import RaceRanking
+from simulate import ENGINES
+from spatial_grid import SpatialGrid
+from utils import SCREEN_WIDTH, SCREEN_HEIGHT, BALL_RADIUS, BLACK
+
+# (map module, map kwargs) for every course that is benchmarked.
+MAPS = [
+    ('map', {}),
+    ('maps.map1', {}),
+    ('maps.map2', {'difficulty': 'easy'}),
+    ('maps.map2', {'difficulty': 'normal'}),
+    ('maps.map2', {'difficulty': 'hard'}),
+    ('maps.map3', {}),
+]
+FIELD_SIZES = [10, 100, 1000, 10000]
+# Room per ball in the spawn cluster, the same crowding as a normal race
+# (about 45 balls in the top quarter of the screen).
+SPAWN_AREA_PER_BALL = 1800
+# Ticks traced for peak memory; tracemalloc slows everything down, so this
+# is a separate, shorter run from the timed one.
+MEMORY_TICKS = 30
+# Untimed ticks run before each timed pass, so caches, the allocator and the
+# first contacts have settled.
+WARMUP_TICKS = 20
+# Timed passes per case; the best of them is reported, as timeit does, since
+# noise from the rest of the machine only ever makes a pass slower.
+REPEATS = 5
+# A result counts as a regression when it is this much worse than baseline.
+TOLERANCE = 0.15
+# p99 over a pass is one of its slowest few ticks, so a single scheduler
+# hiccup moves it; it gets a wider margin than throughput.
+P99_TOLERANCE = 0.5
+
+
+def spawn_field(count):
+    """Spawns count skinless balls in a cluster above the course, like spawn_balls."""
+    random = rng.stream('spawn')
+    height = max(SCREEN_HEIGHT // 4, count * SPAWN_AREA_PER_BALL // SCREEN_WIDTH)
+    return [
+        Ball(random.randint(BALL_RADIUS, SCREEN_WIDTH - BALL_RADIUS), random.randint(-height, -BALL_RADIUS * 2), None)
+        for _ in range(count)
+    ]
+
+
+def build_race(map_module, map_kwargs, count, seed):
+    rng.seed_streams(seed)
+    balls = spawn_field(count)
+    compiled_map = load_compiled_map(map_module, seed, map_kwargs)
+    ramps, obstacles, finish_line_props = compiled_map.build()
+    map_index = MapIndex(ramps, obstacles, geometry=compiled_map.geometry())
+    return balls, ramps, obstacles, finish_line_props, map_index
+
+
+def timings(durations_ns):
+    """Turns per-tick durations into throughput and latency figures."""
+    durations = numpy.array(durations_ns, dtype=numpy.float64) / 1e6
+    return {
+        'ticks_per_sec': round(float(len(durations) / (durations.sum() / 1000)), 2),
+        'p50_ms': round(float(numpy.percentile(durations, 50)), 4),
+        'p99_ms': round(float(numpy.percentile(durations, 99)), 4),
+    }
+
+
+def build_engine(balls, engine):
+    """Returns the balls to step and the BallField behind them, if the engine uses one."""
+    if engine == 'field':
+        field = BallField(balls)
+        return field.balls, field
+    return balls, None
+
+
+def best_of(passes):
+    """Combines the timings of repeated passes, keeping the best figure of each."""
+    return {
+        'ticks_per_sec': max(p['ticks_per_sec'] for p in passes),
+        'p50_ms': min(p['p50_ms'] for p in passes),
+        'p99_ms': min(p['p99_ms'] for p in passes),
+    }
+
+
+def physics_pass(map_module, map_kwargs, count, ticks, seed, engine='balls', warmup=WARMUP_TICKS):
+    """
+    Times ball updates, ball-vs-ball collisions and particle updates, one tick
+    at a time. Every pass starts the race afresh, so repeated passes time the
+    same ticks.
+    """
+    balls, ramps, obstacles, _, map_index = build_race(map_module, map_kwargs, count, seed)
+    balls, field = build_engine(balls, engine)
+    particles = ParticlePool()
+    grid = SpatialGrid()
+    for _ in range(warmup):
+        step_physics(balls, particles, obstacles, ramps, map_index, grid, field=field)
+    durations = []
+    for _ in range(ticks):
+        start = time.perf_counter_ns()
+        step_physics(balls, particles, obstacles, ramps, map_index, grid, field=field)
+        durations.append(time.perf_counter_ns() - start)
+    return timings(durations)
+
+
+def physics_memory(map_module, map_kwargs, count, ticks, seed, engine='balls'):
+    """Peak traced memory for building the race and stepping it for a few ticks."""
+    tracemalloc.start()
+    balls, ramps, obstacles, _, map_index = build_race(map_module, map_kwargs, count, seed)
+    balls, field = build_engine(balls, engine)
+    particles = ParticlePool()
+    grid = SpatialGrid()
+    for _ in range(min(ticks, MEMORY_TICKS)):
+        step_physics(balls, particles, obstacles, ramps, map_index, grid, field=field)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def render_pass(map_module, map_kwargs, count, ticks, seed, warmup=WARMUP_TICKS):
+    """
+    Times drawing a frame and grabbing its pixels for the recorder, separately.
+    Physics runs between frames so the camera and balls move as in a race,
+    but is not part of either timing.
+    """
+    from course_cache import CourseTileCache
+    from culling import visible
+    from background import load_background
+    from main import draw_rankings, follow_camera
+
+    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+    ranking_font = pygame.font.Font(None, 28)
+    trophy_font = pygame.font.SysFont(['Segoe UI Emoji', 'Apple Color Emoji', 'Noto Color Emoji'], 36)
+    balls, ramps, obstacles, finish_line_props, map_index = build_race(map_module, map_kwargs, count, seed)
+    course_cache = CourseTileCache(ramps, obstacles, finish_line_props)
+    background = load_background()
+    particles = ParticlePool()
+    grid = SpatialGrid()
+    ranking = RaceRanking(balls)
+
+    camera_y = ranking.leader().y - SCREEN_HEIGHT / 1.5
+    render = []
+    capture = []
+    for tick in range(warmup + ticks):
+        step_physics(balls, particles, obstacles, ramps, map_index, grid)
+        ranking.update()
+        camera_y = follow_camera(camera_y, ranking.leader().y)
+
+        start = time.perf_counter_ns()
+        screen.fill(BLACK)
+        background.draw(screen, camera_y)
+        course_cache.draw(screen, camera_y)
+        particles.draw(screen, camera_y)
+        draw_balls(screen, visible(balls, camera_y), camera_y)
+        draw_rankings(screen, ranking.top(3), ranking_font, trophy_font)
+        middle = time.perf_counter_ns()
+        pygame.image.tobytes(screen, 'RGB')
+        end = time.perf_counter_ns()
+        if tick >= warmup:
+            render.append(middle - start)
+            capture.append(end - middle)
+    return timings(render), timings(capture)
+
+
+def case_name(map_module, map_kwargs, count, engine='balls'):
+    difficulty = map_kwargs.get('difficulty')
+    # The default engine keeps the plain names, so older baselines still match.
+    suffix = '' if engine == 'balls' else f":{engine}"
+    return f"{map_module}{f'[{difficulty}]' if difficulty else ''}/{count}{suffix}"
+
+
+def run_suite(maps=MAPS, sizes=FIELD_SIZES, ticks=200, seed=0, render_sizes=(100, 1000), engines=ENGINES,
+              warmup=WARMUP_TICKS, repeats=REPEATS):
+    """
+    Runs every case and returns the results in the benchmark file format.
+    The repeats go round all the cases in turn rather than running one case
+    several times in a row, so a slow spell on the machine only costs each
+    case one of its passes.
+    """
+    results = {
+        'meta': {
+            'python': platform.python_version(),
+            'pygame': pygame.version.ver,
+            'numpy': numpy.__version__,
+            'machine': platform.machine(),
+            'platform': platform.platform(),
+            'ticks': ticks,
+            'warmup_ticks': warmup,
+            'repeats': repeats,
+            'seed': seed,
+        },
+        'physics': {},
+        'render': {},
+        'capture': {},
+    }
+    cases = [
+        (case_name(map_module, map_kwargs, count, engine), map_module, map_kwargs, count, engine)
+        for map_module, map_kwargs in maps for count in sizes for engine in engines
+    ]
+    passes = {name: [] for name, *_ in cases}
+    for _ in range(repeats):
+        for name, map_module, map_kwargs, count, engine in cases:
+            passes[name].append(physics_pass(map_module, map_kwargs, count, ticks, seed, engine, warmup))
+    for name, map_module, map_kwargs, count, engine in cases:
+        peak = physics_memory(map_module, map_kwargs, count, ticks, seed, engine)
+        results['physics'][name] = dict(best_of(passes[name]), peak_memory_bytes=peak)
+        print(f"physics {name}: {results['physics'][name]}")
+
+    if render_sizes:
+        os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+        pygame.init()
+        map_module, map_kwargs = maps[0]
+        names = [case_name(map_module, map_kwargs, count) for count in render_sizes]
+        render_passes = {name: [] for name in names}
+        capture_passes = {name: [] for name in names}
+        for _ in range(repeats):
+            for name, count in zip(names, render_sizes):
+                render, capture = render_pass(map_module, map_kwargs, count, ticks, seed, warmup)
+                render_passes[name].append(render)
+                capture_passes[name].append(capture)
+        for name in names:
+            results['render'][name] = best_of(render_passes[name])
+            results['capture'][name] = best_of(capture_passes[name])
+            print(f"render {name}: {results['render'][name]}")
+            print(f"capture {name}: {results['capture'][name]}")
+        pygame.quit()
+    return results
+
+
+def compare(results, baseline, tolerance=TOLERANCE, p99_tolerance=P99_TOLERANCE):
+    """
+    Compares results with a baseline run and returns the regressions found:
+    cases with fewer ticks per second by more than tolerance, or a p99 higher
+    by more than p99_tolerance. Cases missing from either run are skipped.
+    """
+    regressions = []
+    for section in ('physics', 'render', 'capture'):
+        for name, current in results.get(section, {}).items():
+            before = baseline.get(section, {}).get(name)
+            if before is None:
+                continue
+            if current['ticks_per_sec'] < before['ticks_per_sec'] * (1 - tolerance):
+                regressions.append(f"{section} {name}: {before['ticks_per_sec']} -> {current['ticks_per_sec']} ticks/sec")
+            if current['p99_ms'] > before['p99_ms'] * (1 + p99_tolerance):
+                regressions.append(f"{section} {name}: p99 {before['p99_ms']} -> {current['p99_ms']} ms")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark physics, rendering and frame capture.")
+    parser.add_argument("--ticks", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=WARMUP_TICKS, help="untimed ticks before each timed pass")
+    parser.add_argument("--repeats", type=int, default=REPEATS, help="timed passes per case; the best is kept")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--sizes", type=int, nargs="+", default=FIELD_SIZES)
+    parser.add_argument("--maps", nargs="+", help="only these map modules, e.g. map maps.map2")
+    parser.add_argument("--engines", nargs="+", choices=ENGINES, default=ENGINES,
+                        help="physics engines to time (see simulate.ENGINES)")
+    parser.add_argument("--no-render", action="store_true", help="skip the render and capture timings")
+    parser.add_argument("--output", default="benchmark.json")
+    parser.add_argument("--baseline", help="earlier benchmark output to compare against")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    parser.add_argument("--p99-tolerance", type=float, default=P99_TOLERANCE)
+    args = parser.parse_args()
+
+    maps = [case for case in MAPS if not args.maps or case[0] in args.maps]
+    results = run_suite(maps, args.sizes, args.ticks, args.seed, () if args.no_render else (100, 1000),
+                        args.engines, args.warmup, args.repeats)
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to '{args.output}'")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance, args.p99_tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+        print("No regressions against the baseline.")
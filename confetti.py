@@ -1,26 +1,38 @@
 import pygame
-import random
+import numpy
+import rng
 from utils import SCREEN_WIDTH, SCREEN_HEIGHT, CONFETTI_COLORS
 
-class Confetti:
-    """Represents a single piece of celebratory confetti."""
-    def __init__(self):
-        # Start at a random position across the top of the screen.
-        self.x = random.randint(0, SCREEN_WIDTH)
-        self.y = random.randint(-SCREEN_HEIGHT, 0)
-        self.vx = random.uniform(-1, 1) # Slight horizontal drift
-        self.vy = random.uniform(3, 7)  # Falling speed
-        self.color = random.choice(CONFETTI_COLORS)
-        self.width = random.randint(5, 10)
-        self.height = random.randint(10, 15)
-        self.rect = pygame.Rect(self.x, self.y, self.width, self.height)
+
+class ConfettiPool:
+    """Celebratory confetti, kept in NumPy arrays and drawn in one batched blit."""
+
+    def __init__(self, count=200):
+        random = rng.stream('confetti')
+        # Start at random positions across the top of the screen.
+        self.x = numpy.array([random.randint(0, SCREEN_WIDTH) for _ in range(count)], dtype=numpy.float32)
+        self.y = numpy.array([random.randint(-SCREEN_HEIGHT, 0) for _ in range(count)], dtype=numpy.float32)
+        self.vx = numpy.array([random.uniform(-1, 1) for _ in range(count)], dtype=numpy.float32)  # Slight horizontal drift
+        self.vy = numpy.array([random.uniform(3, 7) for _ in range(count)], dtype=numpy.float32)  # Falling speed
+
+        # Every piece is one of a few solid rectangles, pre-rendered once.
+        self.sprites = []
+        sprite_cache = {}
+        for _ in range(count):
+            key = (random.randrange(len(CONFETTI_COLORS)), random.randint(5, 10), random.randint(10, 15))
+            if key not in sprite_cache:
+                sprite = pygame.Surface(key[1:])
+                sprite.fill(CONFETTI_COLORS[key[0]])
+                sprite_cache[key] = sprite
+            self.sprites.append(sprite_cache[key])
 
     def update(self):
-        """Update confetti position."""
+        """Update confetti positions."""
         self.x += self.vx
         self.y += self.vy
-        self.rect.topleft = (self.x, self.y)
 
     def draw(self, surface):
-        """Draw the confetti piece on the screen."""
-        pygame.draw.rect(surface, self.color, self.rect)
+        """Draw every piece of confetti on the screen."""
+        x = self.x.astype(numpy.int32).tolist()
+        y = self.y.astype(numpy.int32).tolist()
+        surface.blits(list(zip(self.sprites, zip(x, y))), doreturn=False)
@@ -0,0 +1,75 @@
+import math
+import pygame
+from collections import OrderedDict
+from culling import StaticIndex
+from utils import SCREEN_WIDTH, SCREEN_HEIGHT
+
+# Extra room around each item when deciding which tiles it lands on, enough
+# for the obstacle glow and the ramp line width.
+TILE_PADDING = 8
+
+
+class CourseTileCache:
+    """
+    Pre-rendered static course layer.
+    The finish line, ramps and obstacles never move during a race, so they are
+    baked into screen-width tiles of a fixed height. Only the tiles around the
+    camera are kept, in a small LRU, and each frame blits two or three tiles
+    instead of issuing a draw call per piece of geometry.
+    """
+
+    def __init__(self, ramps, obstacles, finish_line_props, tile_height=512, capacity=4):
+        self.ramps = StaticIndex(ramps, lambda r: (r.aabb[1], r.aabb[3]))
+        self.obstacles = StaticIndex(obstacles, lambda o: (o.rect.top, o.rect.bottom))
+        self.tile_height = tile_height
+        self.capacity = capacity
+        self.tiles = OrderedDict()
+
+        # The finish line texture is scaled once here instead of every frame.
+        self.finish_texture = None
+        self.finish_y = finish_line_props.get('y')
+        if finish_line_props.get('texture'):
+            self.finish_texture = pygame.transform.scale(finish_line_props['texture'],
+                                                         (SCREEN_WIDTH, finish_line_props['height']))
+
+    def _bake(self, index):
+        top = index * self.tile_height
+        bottom = top + self.tile_height
+        ramps = self.ramps.query(top - TILE_PADDING, bottom + TILE_PADDING)
+        obstacles = self.obstacles.query(top - TILE_PADDING, bottom + TILE_PADDING)
+
+        # pygame clips thick lines badly when an end point is off the surface,
+        # so the tile is drawn on a scratch surface tall enough to hold every
+        # ramp it touches and then cropped.
+        scratch_top = min([top] + [ramp.aabb[1] - TILE_PADDING for ramp in ramps])
+        scratch_bottom = max([bottom] + [ramp.aabb[3] + TILE_PADDING for ramp in ramps])
+        scratch_top = int(scratch_top) - 1
+        scratch = pygame.Surface((SCREEN_WIDTH, int(scratch_bottom) + 1 - scratch_top), pygame.SRCALPHA)
+
+        # Same draw order as the old per-frame loop: finish line, ramps, obstacles.
+        if self.finish_texture:
+            scratch.blit(self.finish_texture, (0, self.finish_y - scratch_top))
+        for ramp in ramps:
+            ramp.draw(scratch, scratch_top)
+        for obstacle in obstacles:
+            obstacle.draw_premultiplied(scratch, scratch_top)
+        return scratch.subsurface((0, top - scratch_top, SCREEN_WIDTH, self.tile_height)).copy()
+
+    def _tile(self, index):
+        tile = self.tiles.get(index)
+        if tile is None:
+            tile = self._bake(index)
+            self.tiles[index] = tile
+            if len(self.tiles) > self.capacity:
+                self.tiles.popitem(last=False)
+        else:
+            self.tiles.move_to_end(index)
+        return tile
+
+    def draw(self, surface, camera_y):
+        """Blits the tiles overlapping the camera window."""
+        first = math.floor(camera_y / self.tile_height)
+        last = math.floor((camera_y + SCREEN_HEIGHT) / self.tile_height)
+        for index in range(first, last + 1):
+            tile = self._tile(index)
+            surface.blit(tile, (0, index * self.tile_height - camera_y), special_flags=pygame.BLEND_PREMULTIPLIED)
@@ -0,0 +1,37 @@
+from bisect import bisect_left, bisect_right
+from utils import SCREEN_HEIGHT, BALL_RADIUS
+
+# Anything this close to the camera window still gets drawn, so balls and
+# glows sliding in from the edge never pop.
+CULL_MARGIN = BALL_RADIUS * 2
+
+
+class StaticIndex:
+    """
+    Y-sorted index over static geometry for visibility queries.
+    Items are sorted by their top edge; a window query bisects to the items
+    starting at most one tallest-item height above the window, then keeps the
+    ones that really reach into it.
+    """
+
+    def __init__(self, items, extent):
+        # extent(item) -> (top, bottom)
+        spans = sorted((extent(item) + (i, item) for i, item in enumerate(items)), key=lambda s: s[0])
+        self.tops = [span[0] for span in spans]
+        self.spans = spans
+        self.max_height = max((bottom - top for top, bottom, _, _ in spans), default=0)
+
+    def query(self, top, bottom):
+        """Returns the items overlapping [top, bottom], in their original order."""
+        start = bisect_left(self.tops, top - self.max_height)
+        end = bisect_right(self.tops, bottom)
+        hits = [span for span in self.spans[start:end] if span[1] >= top]
+        hits.sort(key=lambda span: span[2])
+        return [span[3] for span in hits]
+
+
+def visible(entities, camera_y, margin=CULL_MARGIN):
+    """Cheap range filter for moving entities: keeps those near the camera window."""
+    top = camera_y - margin
+    bottom = camera_y + SCREEN_HEIGHT + margin
+    return [e for e in entities if top <= e.y <= bottom]
@@ -0,0 +1,185 @@
+import email.utils
+import hashlib
+import io
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import pygame
+import requests
+from requests.adapters import HTTPAdapter
+from utils import SKIN_MANIFEST, crop_skin
+
+MANIFEST_VERSION = 2
+# Statuses worth another try; anything else in 4xx is final.
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+# How many finished downloads go by between manifest saves.
+SAVE_EVERY = 50
+
+
+class AvatarDownloader:
+    """
+    Downloads many small files concurrently.
+    A fixed pool of worker threads shares one keep-alive session, so
+    connections are reused instead of opened per avatar. Failed requests are
+    retried with exponential backoff; a 429 pauses every worker until the
+    server's Retry-After has passed. Finished files are recorded in a
+    manifest in the target folder, so an interrupted run picks up where it
+    stopped.
+
+    Avatars are saved already scaled and cut to the ball size, as PNGs named
+    after a hash of their pixels. Users with identical pictures (the default
+    avatar, typically) share a single file; the manifest maps each username
+    to its image.
+    """
+
+    def __init__(self, folder, max_workers=16, retries=4, backoff=0.5, timeout=10, session=None):
+        self.folder = folder
+        self.max_workers = max_workers
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.manifest_path = os.path.join(folder, SKIN_MANIFEST)
+        self.manifest = self._load_manifest()
+        self._lock = threading.Lock()
+        self._resume_at = 0.0
+        self._unsaved = 0
+
+        self.session = session
+        if self.session is None:
+            self.session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+            self.session.mount("http://", adapter)
+            self.session.mount("https://", adapter)
+
+    def _load_manifest(self):
+        try:
+            with open(self.manifest_path) as f:
+                manifest = json.load(f)
+            if manifest.get('version') == MANIFEST_VERSION:
+                return manifest
+        except (OSError, ValueError):
+            pass
+        return {'version': MANIFEST_VERSION, 'users': {}}
+
+    def save_manifest(self):
+        """Writes the manifest out atomically."""
+        with self._lock:
+            data = json.dumps(self.manifest, indent=1)
+            self._unsaved = 0
+        with open(self.manifest_path + '.tmp', 'w') as f:
+            f.write(data)
+        os.replace(self.manifest_path + '.tmp', self.manifest_path)
+
+    def is_done(self, username):
+        entry = self.manifest['users'].get(username)
+        return entry is not None and os.path.exists(os.path.join(self.folder, entry['image']))
+
+    def _wait_for_rate_limit(self):
+        delay = self._resume_at - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+    def _rate_limited(self, response, attempt):
+        delay = retry_after_seconds(response.headers.get('Retry-After'))
+        if delay is None:
+            delay = self.backoff * 2 ** attempt
+        with self._lock:
+            self._resume_at = max(self._resume_at, time.monotonic() + delay)
+
+    def fetch(self, url):
+        """Returns the body of url, retrying transient failures. Raises on final failure."""
+        for attempt in range(self.retries + 1):
+            self._wait_for_rate_limit()
+            last_attempt = attempt == self.retries
+            try:
+                response = self.session.get(url, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout):
+                if last_attempt:
+                    raise
+            else:
+                if response.status_code not in RETRY_STATUSES or last_attempt:
+                    response.raise_for_status()
+                    return response.content
+                if response.status_code == 429:
+                    self._rate_limited(response, attempt)
+                    continue
+            # Full jitter keeps the workers from retrying in lockstep.
+            time.sleep(random.uniform(0, self.backoff * 2 ** attempt))
+
+    def _download_one(self, username, url):
+        # Cropped once here, so race starts never touch the full-size image.
+        skin = crop_skin(pygame.image.load(io.BytesIO(self.fetch(url))))
+        digest = hashlib.sha1(pygame.image.tobytes(skin, 'RGBA')).hexdigest()
+        image = digest[:16] + '.png'
+        path = os.path.join(self.folder, image)
+        if not os.path.exists(path):
+            # Saved through a .part file so a crash never leaves a broken image.
+            # Each worker gets its own, since users sharing an avatar can
+            # reach this point at the same time; whoever swaps in last wins
+            # with identical bytes.
+            encoded = io.BytesIO()
+            pygame.image.save(skin, encoded, image)
+            fd, part_path = tempfile.mkstemp(suffix='.part', dir=self.folder)
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(encoded.getvalue())
+                os.replace(part_path, path)
+            except OSError:
+                if os.path.exists(part_path):
+                    os.remove(part_path)
+                raise
+        with self._lock:
+            self.manifest['users'][username] = {'image': image, 'url': url}
+            self._unsaved += 1
+            save = self._unsaved >= SAVE_EVERY
+        if save:
+            self.save_manifest()
+
+    def download(self, jobs):
+        """
+        Downloads (username, url) jobs into the folder.
+        Users already recorded in the manifest are skipped. Returns a dict
+        with the downloaded, skipped and failed counts.
+        """
+        os.makedirs(self.folder, exist_ok=True)
+        counts = {'downloaded': 0, 'skipped': 0, 'failed': 0}
+        todo = []
+        for username, url in jobs:
+            if self.is_done(username):
+                counts['skipped'] += 1
+            else:
+                todo.append((username, url))
+
+        try:
+            with ThreadPoolExecutor(self.max_workers) as pool:
+                futures = {pool.submit(self._download_one, *job): job for job in todo}
+                for future in as_completed(futures):
+                    username = futures[future][0]
+                    try:
+                        future.result()
+                        counts['downloaded'] += 1
+                    except (requests.RequestException, OSError, pygame.error) as e:
+                        counts['failed'] += 1
+                        print(f"    - Could not download image for {username}: {e}")
+        finally:
+            self.save_manifest()
+        return counts
+
+
+def retry_after_seconds(value):
+    """Parses a Retry-After header, given either in seconds or as an HTTP date."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        date = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, date.timestamp() - time.time())
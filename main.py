@@ -1,24 +1,65 @@
 import pygame
-import random
-import numpy
-import vidmaker  # <-- Import vidmaker
-from ball import Ball
-from particle import Particle
+from ball import draw_balls
+from particle import ParticlePool
 from obstacle import Obstacle
 from ramp import Ramp
-from confetti import Confetti
-from utils import SCREEN_WIDTH, SCREEN_HEIGHT, BLACK, WHITE, load_skins, load_texture
+from confetti import ConfettiPool
+from utils import SCREEN_WIDTH, SCREEN_HEIGHT, BLACK, WHITE
+from background import load_background
 from map import get_map_layout
-import subprocess
+from spatial_grid import SpatialGrid
+from race import retire_finished, spawn_balls, step_physics
+from map_index import MapIndex
+from map_compiler import load_compiled_map
+from course_cache import CourseTileCache
+from culling import visible
+from recorder import StreamingRecorder
+from skin_atlas import load_race_skins
+from profiler import PhaseTimer
+from ranking import RaceRanking
+import rng
 
 # --- Recording Flag ---
 # Set this to True to record the next race to a video file.
 RECORDING = True
 
+# --- Race Seed ---
+# Set to an integer to make the race reproducible; `python simulate.py map --seed N`
+# then plays out exactly the same race headlessly.
+RACE_SEED = None
 
-def draw_rankings(surface, balls, font, icon_font):
-    """Draws the live top 3 ranking on the screen."""
-    sorted_balls = sorted(balls, key=lambda b: b.y, reverse=True)
+# --- Profiling ---
+# Times every phase of the frame and shows rolling p50/p99 per phase in a HUD.
+PROFILING = False
+# With profiling on, every phase is also written here as Chrome trace-event JSON.
+TRACE_FILE = "frame_trace.json"
+
+
+def follow_camera(camera_y, leader_y):
+    """Eases the camera towards the leader, keeping it in the top third of the screen."""
+    target_camera_y = leader_y - SCREEN_HEIGHT / 1.5
+    return camera_y + (target_camera_y - camera_y) * 0.08
+
+
+def draw_winner_screen(surface, winner, font, small_font):
+    """Dims the finished course and shows the winner's name and skin."""
+    overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA)
+    overlay.fill((0, 0, 0, 180))
+    surface.blit(overlay, (0, 0))
+
+    winner_text = font.render("WINNER!", True, WHITE)
+    surface.blit(winner_text, winner_text.get_rect(center=(SCREEN_WIDTH / 2, SCREEN_HEIGHT / 2 - 150)))
+
+    username_text = small_font.render(winner.username, True, (255, 215, 0))
+    surface.blit(username_text, username_text.get_rect(center=(SCREEN_WIDTH / 2, SCREEN_HEIGHT / 2 + 100)))
+
+    if winner.skin:
+        winner_img = pygame.transform.smoothscale(winner.skin, (200, 200))
+        surface.blit(winner_img, winner_img.get_rect(center=(SCREEN_WIDTH / 2, SCREEN_HEIGHT / 2 - 20)))
+
+
+def draw_rankings(surface, leaders, font, icon_font):
+    """Draws the live top 3 ranking on the screen, given the top balls in order (see RaceRanking.top)."""
 
     trophies = {
         0: ("🥇", (255, 215, 0)),
@@ -26,8 +67,8 @@ def draw_rankings(surface, balls, font, icon_font):
         2: ("🥉", (205, 127, 50))
     }
 
-    for i in range(min(3, len(sorted_balls))):
-        ball = sorted_balls[i]
+    for i in range(min(3, len(leaders))):
+        ball = leaders[i]
         y_pos = 50 + i * 40
 
         trophy_text, trophy_color = trophies[i]
@@ -58,32 +99,18 @@ def game_loop():
     emoji_font_names = ['Segoe UI Emoji', 'Apple Color Emoji', 'Noto Color Emoji']
     trophy_font = pygame.font.SysFont(emoji_font_names, 36)
 
-    # --- Video Recorder ---
-    video = None
-    if RECORDING:
-        # Initialize the video recorder if the flag is set
-        print("RECORDING ENABLED: The race will be saved to 'race_recording.mp4'")
-        video = vidmaker.Video(path="race_recording.mp4", fps=60, resolution=(SCREEN_WIDTH, SCREEN_HEIGHT))
-    else:
-        print("Recording is disabled.")
-
     # --- Dynamic Background ---
-    background_img = load_texture('Nebula Aqua-Pink.png')
-    stars_imgs = [
-        load_texture('Stars Small_1.png'),
-        load_texture('Stars Small_2.png'),
-        load_texture('Stars-Big_1_1_PC.png'),
-        load_texture('Stars-Big_1_2_PC.png')
-    ]
-    bg_y = 0
-    stars_y = [0, 0, 0, 0]
-    star_speeds = [0.1, 0.2, 0.35, 0.5]
+    background = load_background()
+
+    # --- Frame Profiling ---
+    timer = PhaseTimer(enabled=PROFILING, trace=bool(TRACE_FILE))
+    hud_font = pygame.font.SysFont('monospace', 14) if PROFILING else None
 
 
     # --- Game State & Timing ---
     game_state = "intro"
     winner = None
-    confetti_particles = []
+    confetti = None
     finish_time = 0
     finish_delay = 500
 
@@ -102,54 +129,71 @@ def game_loop():
     pygame.mixer.music.set_volume(0.5)  # Optional: set volume
     pygame.mixer.music.play(1)  # -1 means loop indefinitely
 
+    # --- Video Recorder ---
+    video = None
+    if RECORDING:
+        # Initialize the video recorder if the flag is set
+        print("RECORDING ENABLED: The race will be saved to 'final_output.mp4'")
+        # Frames and the intro music are encoded by one ffmpeg run in the background while the race runs.
+        video = StreamingRecorder("final_output.mp4", fps=60, resolution=(SCREEN_WIDTH, SCREEN_HEIGHT),
+                                  audio_path="assets/intro_music2.mp3")
+    else:
+        print("Recording is disabled.")
+
     # --- UI Elements ---
     restart_button_rect = pygame.Rect(SCREEN_WIDTH / 2 - 75, SCREEN_HEIGHT / 2 + 150, 150, 50)
     skip_button_rect = pygame.Rect(SCREEN_WIDTH - 110, SCREEN_HEIGHT - 60, 100, 40)
 
     def start_race():
         """Initializes or resets all game objects for the race."""
-        nonlocal balls, particles, ramps, obstacles, finish_line_props, camera_y, winner, game_state, confetti_particles, ball_skins, new_ball_skins, intro_start_time, intro_scroll_x, finish_time
+        nonlocal balls, particles, ramps, obstacles, map_index, course_cache, finish_line_props, camera_y, winner, game_state, confetti, ball_skins, new_ball_skins, intro_start_time, intro_scroll_x, finish_time, ranking, race_tick
 
-        ball_skins = load_skins() + load_skins("new_skins")
+        ball_skins, new_ball_skins = load_race_skins()
         if not ball_skins:
             print("\n--- No skins loaded. Running with default circles. ---")
-
-        new_ball_skins = load_skins("new_skins")
         if not new_ball_skins:
             print("\n--- No skins loaded. Running with default circles. ---")
 
-        balls = []
-        from utils import NUM_BALLS, BALL_RADIUS, NUM_NEW_BALLS
-        for i in range(NUM_BALLS):
-            x_pos = random.randint(BALL_RADIUS, SCREEN_WIDTH - BALL_RADIUS)
-            # Balls now spawn in a tighter cluster at the top of the screen
-            y_pos = random.randint(-SCREEN_HEIGHT // 4, -BALL_RADIUS * 2)
-            skin_info = ball_skins[i % len(ball_skins)] if ball_skins else None
-            balls.append(Ball(x_pos, y_pos, skin_info))
-        for i in range(NUM_NEW_BALLS):
-            x_pos = random.randint(BALL_RADIUS, SCREEN_WIDTH - BALL_RADIUS)
-            # Balls now spawn in a tighter cluster at the top of the screen
-            y_pos = random.randint(-SCREEN_HEIGHT // 4, -BALL_RADIUS * 2)
-            new_skin_info = new_ball_skins[i % len(new_ball_skins)] if new_ball_skins else None
-            balls.append(Ball(x_pos, y_pos, new_skin_info))
-
-        particles = []
-        ramps, obstacles, finish_line_props = get_map_layout()
+        if RACE_SEED is not None:
+            rng.seed_streams(RACE_SEED)
+        balls = spawn_balls(ball_skins, new_ball_skins)
+        ranking = RaceRanking(balls)
+        race_tick = 0
+
+        particles = ParticlePool()
+        if RACE_SEED is not None:
+            # A seeded layout is the same every time, so it comes from the map cache.
+            compiled_map = load_compiled_map('map', RACE_SEED)
+            ramps, obstacles, finish_line_props = compiled_map.build()
+            map_index = MapIndex(ramps, obstacles, geometry=compiled_map.geometry())
+        else:
+            ramps, obstacles, finish_line_props = get_map_layout()
+            map_index = MapIndex(ramps, obstacles)
+        course_cache = CourseTileCache(ramps, obstacles, finish_line_props)
         camera_y = 0.0
         winner = None
         game_state = "intro"
-        confetti_particles = []
+        confetti = None
         finish_time = 0
 
         intro_start_time = pygame.time.get_ticks()
         intro_scroll_x = SCREEN_WIDTH
 
-    balls, particles, ramps, obstacles, finish_line_props, camera_y, ball_skins, new_ball_skins = [], [], [], [], {}, 0.0, [], []
+    balls, particles, ramps, obstacles, finish_line_props, camera_y, ball_skins, new_ball_skins = [], None, [], [], {}, 0.0, [], []
+    map_index = None
+    course_cache = None
+    ranking = None
+    race_tick = 0
     start_race()
 
+    # Broadphase grid is reused every frame so its bucket dict isn't reallocated per call.
+    collision_grid = SpatialGrid()
+
     running = True
     while running:
-        for event in pygame.event.get():
+        with timer.phase("events"):
+            events = pygame.event.get()
+        for event in events:
             if event.type == pygame.QUIT:
                 running = False
             if event.type == pygame.MOUSEBUTTONDOWN:
@@ -180,57 +224,41 @@ def game_loop():
                 pygame.mixer.music.stop()
 
         elif game_state == "race" or game_state == "finishing":
-            for ball in balls:
-                ball.update(obstacles, ramps)
-            for particle in particles:
-                particle.update()
-            particles = [p for p in particles if p.lifespan > 0]
-            handle_ball_collisions(balls, particles)
-
-            if game_state == "race" and finish_line_props.get('y'):
-                for ball in balls:
-                    if ball.y + ball.radius > finish_line_props['y']:
-                        winner = ball
-                        game_state = "finishing"
-                        finish_time = pygame.time.get_ticks()
-                        break
+            step_physics(balls, particles, obstacles, ramps, map_index, collision_grid, timer)
+            race_tick += 1
+
+            ranking.update()
+            if finish_line_props.get('y'):
+                # Finished balls are retired from the physics but still drawn.
+                ranking.record_finishes(retire_finished(balls, finish_line_props['y']), race_tick)
+            if game_state == "race" and ranking.winner():
+                winner = ranking.winner()
+                game_state = "finishing"
+                finish_time = pygame.time.get_ticks()
 
             if game_state == "finishing" and pygame.time.get_ticks() - finish_time > finish_delay:
                 game_state = "finished"
-                for _ in range(200):
-                    confetti_particles.append(Confetti())
+                confetti = ConfettiPool(200)
 
         elif game_state == "finished":
-            for p in confetti_particles:
-                p.update()
+            confetti.update()
 
         # --- Camera Control ---
         if (game_state == "race" or game_state == "finishing") and balls:
-            leader_ball = max(balls, key=lambda b: b.y)
-            target_camera_y = leader_ball.y - SCREEN_HEIGHT / 1.5
-            camera_y += (target_camera_y - camera_y) * 0.08
+            with timer.phase("camera"):
+                leader_ball = ranking.leader()
+                camera_y = follow_camera(camera_y, leader_ball.y)
         elif game_state == "countdown": # Keep camera still during countdown
-             leader_ball = max(balls, key=lambda b: b.y)
+             leader_ball = ranking.leader()
              target_camera_y = leader_ball.y - SCREEN_HEIGHT / 1.5
              camera_y = target_camera_y
 
         # --- Drawing ---
-        screen.fill(BLACK)
-
-        # Draw Dynamic Background
-        if background_img:
-            bg_y = -camera_y * 0.1  # Slower scroll for the main background
-            # Tiling the background
-            screen.blit(background_img, (0, bg_y % background_img.get_height() - background_img.get_height()))
-            screen.blit(background_img, (0, bg_y % background_img.get_height()))
-
-        for i, stars_img in enumerate(stars_imgs):
-            if stars_img:
-                stars_y[i] = -camera_y * star_speeds[i]
-                # Tiling the star layers
-                screen.blit(stars_img, (0, stars_y[i] % stars_img.get_height() - stars_img.get_height()))
-                screen.blit(stars_img, (0, stars_y[i] % stars_img.get_height()))
+        with timer.phase("background"):
+            screen.fill(BLACK)
 
+            # Draw Dynamic Background
+            background.draw(screen, camera_y)
 
         if game_state == "intro":
             title_text = title_font.render("New Competitors", True, WHITE)
@@ -259,16 +287,8 @@ def game_loop():
 
         elif game_state == "countdown":
             # Draw everything in a static position
-            if finish_line_props.get('texture'):
-                scaled_texture = pygame.transform.scale(finish_line_props['texture'],
-                                                        (SCREEN_WIDTH, finish_line_props['height']))
-                screen.blit(scaled_texture, (0, finish_line_props['y'] - camera_y))
-            for ramp in ramps:
-                ramp.draw(screen, camera_y)
-            for obstacle in obstacles:
-                obstacle.draw(screen, camera_y)
-            for ball in balls:
-                ball.draw(screen, camera_y)
+            course_cache.draw(screen, camera_y)
+            draw_balls(screen, visible(balls, camera_y), camera_y)
 
             # Draw countdown text
             elapsed = pygame.time.get_ticks() - countdown_start_time
@@ -285,51 +305,24 @@ def game_loop():
 
 
         elif game_state == "race" or game_state == "finishing":
-            if finish_line_props.get('texture'):
-                scaled_texture = pygame.transform.scale(finish_line_props['texture'],
-                                                        (SCREEN_WIDTH, finish_line_props['height']))
-                screen.blit(scaled_texture, (0, finish_line_props['y'] - camera_y))
-            for ramp in ramps:
-                ramp.draw(screen, camera_y)
-            for obstacle in obstacles:
-                obstacle.draw(screen, camera_y)
-            for particle in particles:
-                particle.draw(screen, camera_y)
-            for ball in balls:
-                ball.draw(screen, camera_y)
-
-            draw_rankings(screen, balls, ranking_font, trophy_font)
+            with timer.phase("course"):
+                course_cache.draw(screen, camera_y)
+            with timer.phase("sparkles"):
+                particles.draw(screen, camera_y)
+            with timer.phase("balls"):
+                draw_balls(screen, visible(balls, camera_y), camera_y)
+
+            with timer.phase("rankings"):
+                draw_rankings(screen, ranking.top(3), ranking_font, trophy_font)
 
         elif game_state == "finished" and winner:
-            if finish_line_props.get('texture'):
-                scaled_texture = pygame.transform.scale(finish_line_props['texture'],
-                                                        (SCREEN_WIDTH, finish_line_props['height']))
-                screen.blit(scaled_texture, (0, finish_line_props['y'] - camera_y))
-            for ramp in ramps:
-                ramp.draw(screen, camera_y)
-            for obstacle in obstacles:
-                obstacle.draw(screen, camera_y)
-            for particle in particles:
-                particle.draw(screen, camera_y)
-            for ball in balls:
-                ball.draw(screen, camera_y)
-
-            for p in confetti_particles:
-                p.draw(screen)
-
-            overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA)
-            overlay.fill((0, 0, 0, 180))
-            screen.blit(overlay, (0, 0))
-
-            winner_text = font.render("WINNER!", True, WHITE)
-            screen.blit(winner_text, winner_text.get_rect(center=(SCREEN_WIDTH / 2, SCREEN_HEIGHT / 2 - 150)))
-
-            username_text = small_font.render(winner.username, True, (255, 215, 0))
-            screen.blit(username_text, username_text.get_rect(center=(SCREEN_WIDTH / 2, SCREEN_HEIGHT / 2 + 100)))
-
-            if winner.skin:
-                winner_img = pygame.transform.smoothscale(winner.skin, (200, 200))
-                screen.blit(winner_img, winner_img.get_rect(center=(SCREEN_WIDTH / 2, SCREEN_HEIGHT / 2 - 20)))
+            course_cache.draw(screen, camera_y)
+            particles.draw(screen, camera_y)
+            draw_balls(screen, visible(balls, camera_y), camera_y)
+
+            confetti.draw(screen)
+
+            draw_winner_screen(screen, winner, font, small_font)
 
             elapsed_time = pygame.time.get_ticks()
 
@@ -341,49 +334,29 @@ def game_loop():
             # restart_text = font.render("Restart", True, WHITE)
             # screen.blit(restart_text, restart_text.get_rect(center=restart_button_rect.center))
 
-        pygame.display.flip()
-
-        # --- Add frame to video ---
+        # The HUD isn't recorded: it is drawn after the frame is captured.
         if RECORDING and video:
-            # Capture the current screen frame
-            frame = pygame.surfarray.array3d(screen)
-            # Transpose the frame from (width, height, 3) to (height, width, 3) for vidmaker
-            transposed_frame = numpy.transpose(frame, (1, 0, 2))
-            # Add the frame to the video
-            video.update(transposed_frame, inverted=True)
+            with timer.phase("capture"):
+                # The intro music plays through the intro and countdown and stops when the race starts.
+                video.add_frame(screen, audio_playing=game_state in ("intro", "countdown"))
+        timer.draw_hud(screen, hud_font)
+
+        with timer.phase("flip"):
+            pygame.display.flip()
 
         clock.tick(60)
 
     # --- Finalize and close video ---
     if RECORDING and video:
-        print("Saving video... this may take a moment.")
-        video.export(verbose=True)
-        # Merge intro MP3 with recorded MP4
-        print("Merging intro music with video...")
-        subprocess.run([
-            "ffmpeg",
-            "-y",
-            "-i", "race_recording.mp4",  # Video input
-            "-i", "assets/intro_music2.mp3",  # Audio input
-            "-c:v", "copy",  # Copy video stream without re-encoding
-            "-c:a", "aac",  # Encode audio to AAC
-            "-shortest",  # Trim to the shortest stream (video or audio)
-            "final_output.mp4"
-        ])
-
-        print("Video saved as 'race_recording.mp4'")
+        print("Finishing video encoding...")
+        video.close()
+        print("Video saved as 'final_output.mp4'")
 
+    if TRACE_FILE:
+        timer.save_trace(TRACE_FILE)
 
     pygame.quit()
 
 
-def handle_ball_collisions(balls, particles):
-    for i in range(len(balls)):
-        for j in range(i + 1, len(balls)):
-            ball1 = balls[i]
-            ball2 = balls[j]
-            ball1.collide_with_ball(ball2, particles)
-
-
 if __name__ == "__main__":
     game_loop()
\ No newline at end of file
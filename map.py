@@ -6,7 +6,8 @@ from utils import SCREEN_WIDTH, load_texture
 
 def get_map_layout():
     """
-    Returns two lists (ramps, obstacles) and a dictionary for the finish line.
+    Returns two lists (ramps, obstacles) and a dictionary for the finish line
+    and the named course sections.
     This version keeps a single dead-end vertical lane in the slanted maze.
     """
     ramps = []
@@ -132,12 +133,29 @@ def get_map_layout():
     ramps.append(Ramp(0, maze_bottom_y, SCREEN_WIDTH / 2 - 100, maze_bottom_y + 120))
     ramps.append(Ramp(SCREEN_WIDTH, maze_bottom_y, SCREEN_WIDTH / 2 + 100, maze_bottom_y + 120))
 
+    # --- Sections (named course regions, used to attribute stalled balls) ---
+    # The dead-end lane is listed first so it wins over the maze around it.
+    sections = [
+        {'name': 'dead_end_col', 'top': maze_top_y - row_h, 'bottom': maze_bottom_y,
+         'left': dead_end_col * cell_w, 'right': (dead_end_col + 1) * cell_w},
+        {'name': 'opener', 'top': float('-inf'), 'bottom': 800},
+        {'name': 'flippers', 'top': 800, 'bottom': 1840},
+        {'name': 'platforms', 'top': 1840, 'bottom': tunnel_y_start},
+        {'name': 'tunnels', 'top': tunnel_y_start, 'bottom': funnel_y},
+        {'name': 'funnel', 'top': funnel_y, 'bottom': 4000},
+        {'name': 'peg_grid', 'top': 4000, 'bottom': bowl_top_y},
+        {'name': 'bowl', 'top': bowl_top_y, 'bottom': maze_top_y},
+        {'name': 'maze', 'top': maze_top_y, 'bottom': maze_bottom_y},
+        {'name': 'exit', 'top': maze_bottom_y, 'bottom': float('inf')},
+    ]
+
     # --- Finish Line ---
     finish_line_texture = load_texture('finish_line.jpg')
     finish_line_data = {
         'y': maze_bottom_y + 180,
         'height': 50,
-        'texture': finish_line_texture
+        'texture': finish_line_texture,
+        'sections': sections
     }
 
     return ramps, obstacles, finish_line_data
@@ -0,0 +1,138 @@
+import hashlib
+import importlib
+import inspect
+import json
+import os
+import numpy
+import rng
+from narrowphase import MapGeometry
+from obstacle import Obstacle
+from ramp import Ramp
+from utils import load_texture
+
+MAP_CACHE_DIR = '.map_cache'
+# Bump when the compiled layout changes so old files are rebuilt.
+COMPILER_VERSION = 1
+# Every map draws its finish line with this texture.
+FINISH_LINE_TEXTURE = 'finish_line.jpg'
+
+
+class CompiledMap:
+    """
+    A map layout flattened into plain arrays.
+    Obstacles are (left, top, width, height) rows with a colour each, ramps
+    are (x1, y1, x2, y2) rows with a line thickness, and the collision data
+    the kernels need (segment directions, lengths, vertical extents) is
+    precomputed. Loading one never runs the map's generation code.
+    """
+
+    def __init__(self, arrays):
+        self.rects = arrays['rects']
+        self.rect_colors = arrays['rect_colors']
+        self.segments = arrays['segments']
+        self.seg_thickness = arrays['seg_thickness']
+        self.seg_aabb = arrays['seg_aabb']
+        self.seg_direction = arrays['seg_direction']
+        self.seg_length_sq = arrays['seg_length_sq']
+        self.finish_line = json.loads(str(arrays['finish_line']))
+
+    @classmethod
+    def from_layout(cls, ramps, obstacles, finish_line_props):
+        """Flattens a (ramps, obstacles, finish_line_props) layout."""
+        rects = numpy.array([[o.rect.left, o.rect.top, o.rect.width, o.rect.height] for o in obstacles],
+                            dtype=numpy.float64).reshape(-1, 4)
+        segments = numpy.array([[r.p1.x, r.p1.y, r.p2.x, r.p2.y] for r in ramps], dtype=numpy.float64).reshape(-1, 4)
+        finish_line = {key: value for key, value in finish_line_props.items() if key != 'texture'}
+        finish_line['texture'] = FINISH_LINE_TEXTURE if finish_line_props.get('texture') else None
+        return cls({
+            'rects': rects,
+            'rect_colors': numpy.array([o.color for o in obstacles], dtype=numpy.uint8).reshape(-1, 3),
+            'segments': segments,
+            'seg_thickness': numpy.array([r.thickness for r in ramps], dtype=numpy.int32),
+            'seg_aabb': numpy.array([r.aabb for r in ramps], dtype=numpy.float64).reshape(-1, 4),
+            'seg_direction': segments[:, 2:] - segments[:, :2],
+            'seg_length_sq': numpy.array([r.length_sq for r in ramps], dtype=numpy.float64),
+            'finish_line': json.dumps(finish_line),
+        })
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path + '.tmp', 'wb') as f:
+            numpy.savez(f, rects=self.rects, rect_colors=self.rect_colors, segments=self.segments,
+                        seg_thickness=self.seg_thickness, seg_aabb=self.seg_aabb,
+                        seg_direction=self.seg_direction, seg_length_sq=self.seg_length_sq,
+                        finish_line=json.dumps(self.finish_line))
+        os.replace(path + '.tmp', path)
+
+    def geometry(self):
+        """The MapGeometry for the batched kernels, built without any objects."""
+        return MapGeometry.from_arrays(
+            rect_left=self.rects[:, 0],
+            rect_top=self.rects[:, 1],
+            rect_right=self.rects[:, 0] + self.rects[:, 2],
+            rect_bottom=self.rects[:, 1] + self.rects[:, 3],
+            seg_x1=self.segments[:, 0],
+            seg_y1=self.segments[:, 1],
+            seg_dx=self.seg_direction[:, 0],
+            seg_dy=self.seg_direction[:, 1],
+            seg_length_sq=self.seg_length_sq,
+            seg_top=self.seg_aabb[:, 1],
+            seg_bottom=self.seg_aabb[:, 3],
+        )
+
+    def build(self):
+        """
+        Returns (ramps, obstacles, finish_line_props) like get_map_layout, for
+        drawing and the per-ball collision path.
+        """
+        obstacles = [
+            Obstacle(left, top, width, height, color=tuple(color))
+            for (left, top, width, height), color in zip(self.rects.tolist(), self.rect_colors.tolist())
+        ]
+        ramps = [
+            Ramp(x1, y1, x2, y2, thickness)
+            for (x1, y1, x2, y2), thickness in zip(self.segments.tolist(), self.seg_thickness.tolist())
+        ]
+        finish_line_props = dict(self.finish_line)
+        if finish_line_props['texture']:
+            finish_line_props['texture'] = load_texture(finish_line_props['texture'])
+        return ramps, obstacles, finish_line_props
+
+
+def load_map_module(map_module):
+    """Accepts a map module or its import name, e.g. 'map' or 'maps.map2'."""
+    if isinstance(map_module, str):
+        return importlib.import_module(map_module)
+    return map_module
+
+
+def _source_hash(map_module):
+    with open(inspect.getsourcefile(map_module), 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()[:12]
+
+
+def compile_map(map_module, seed, map_kwargs=None):
+    """Runs a map's generation for one seed and flattens the result."""
+    map_module = load_map_module(map_module)
+    rng.seed_map_generation(seed)
+    return CompiledMap.from_layout(*map_module.get_map_layout(**(map_kwargs or {})))
+
+
+def load_compiled_map(map_module, seed, map_kwargs=None, cache_dir=MAP_CACHE_DIR):
+    """
+    Returns the CompiledMap for (map module, seed, map kwargs such as the
+    difficulty), compiling and caching it on first use. Editing the map
+    module invalidates its cached layouts.
+    """
+    map_module = load_map_module(map_module)
+    kwargs = '-'.join(f"{key}={value}" for key, value in sorted((map_kwargs or {}).items()))
+    name = f"{map_module.__name__}-{seed}-{kwargs}-{_source_hash(map_module)}-v{COMPILER_VERSION}.npz"
+    path = os.path.join(cache_dir, name)
+    try:
+        with numpy.load(path) as arrays:
+            return CompiledMap(arrays)
+    except (OSError, ValueError, KeyError):
+        pass
+    compiled = compile_map(map_module, seed, map_kwargs)
+    compiled.save(path)
+    return compiled
@@ -0,0 +1,105 @@
+import math
+import numpy
+from narrowphase import MapGeometry
+from utils import BALL_RADIUS
+
+
+class MapIndex:
+    """
+    Static y-banded index over the map geometry.
+    The course is cut into horizontal bands and each band remembers which
+    obstacles and ramps a ball centred inside it could possibly touch.
+    """
+
+    def __init__(self, ramps, obstacles, band_height=100, margin=BALL_RADIUS * 2, geometry=None):
+        self.band_height = band_height
+        # A compiled map already has its geometry arrays; otherwise they are
+        # gathered from the objects.
+        self.geometry = geometry if geometry is not None else MapGeometry(ramps, obstacles)
+        self.obstacles = list(obstacles)
+        self.ramps = list(ramps)
+        self.bands = {}
+        self._ranges = {}
+
+        # Items are added in their original order so collisions are still
+        # resolved obstacle by obstacle, ramp by ramp, exactly like before.
+        geometry = self.geometry
+        for i, obstacle in enumerate(obstacles):
+            self._insert(geometry.rect_top[i], geometry.rect_bottom[i], margin, obstacle, i, 0)
+        for i, ramp in enumerate(ramps):
+            self._insert(geometry.seg_top[i], geometry.seg_bottom[i], margin, ramp, i, 1)
+
+        # The batched kernels want the same buckets as geometry array indices.
+        self.band_indices = {
+            key: (numpy.array(obs_idx, dtype=numpy.intp), numpy.array(ramp_idx, dtype=numpy.intp))
+            for key, (_, _, obs_idx, ramp_idx) in self.bands.items()
+        }
+        self.bands = {key: (tuple(obs), tuple(rps)) for key, (obs, rps, _, _) in self.bands.items()}
+
+    def _insert(self, top, bottom, margin, item, index, slot):
+        first = math.floor((top - margin) / self.band_height)
+        last = math.floor((bottom + margin) / self.band_height)
+        for band in range(first, last + 1):
+            if band not in self.bands:
+                self.bands[band] = ([], [], [], [])
+            self.bands[band][slot].append(item)
+            self.bands[band][slot + 2].append(index)
+
+    def query(self, y):
+        """Returns the (obstacles, ramps) near a ball whose centre is at height y."""
+        return self.bands.get(math.floor(y / self.band_height), ((), ()))
+
+    def query_range(self, top, bottom):
+        """
+        Returns the (obstacles, ramps) near any height between top and bottom,
+        in their original order, for balls that travel across several bands.
+        """
+        first = math.floor(min(top, bottom) / self.band_height)
+        last = math.floor(max(top, bottom) / self.band_height)
+        if first == last:
+            return self.bands.get(first, ((), ()))
+        # Balls keep crossing the same few band pairs, so merged ranges are kept.
+        merged = self._ranges.get((first, last))
+        if merged is None:
+            bands = [self.band_indices[band] for band in range(first, last + 1) if band in self.band_indices]
+            merged = ((), ())
+            if bands:
+                obstacle_idx = numpy.unique(numpy.concatenate([obs for obs, _ in bands]))
+                ramp_idx = numpy.unique(numpy.concatenate([rps for _, rps in bands]))
+                merged = (tuple(self.obstacles[i] for i in obstacle_idx), tuple(self.ramps[i] for i in ramp_idx))
+            self._ranges[(first, last)] = merged
+        return merged
+
+    def candidate_pairs(self, y):
+        """
+        Returns the (ball, obstacle) and (ball, ramp) candidate index pairs for
+        an array of ball heights, sorted by ball and then by geometry order.
+        """
+        bands = numpy.floor(y / self.band_height).astype(numpy.intp)
+        rect_pairs = ([], [])
+        seg_pairs = ([], [])
+
+        order = numpy.argsort(bands, kind='stable')
+        unique_bands, starts = numpy.unique(bands[order], return_index=True)
+        ends = numpy.append(starts[1:], order.size)
+        for band, start, end in zip(unique_bands, starts, ends):
+            indices = self.band_indices.get(int(band))
+            if indices is None:
+                continue
+            members = order[start:end]
+            for pairs, geometry_idx in zip((rect_pairs, seg_pairs), indices):
+                if geometry_idx.size:
+                    pairs[0].append(numpy.repeat(members, geometry_idx.size))
+                    pairs[1].append(numpy.tile(geometry_idx, members.size))
+
+        return _sorted_pairs(*rect_pairs), _sorted_pairs(*seg_pairs)
+
+
+def _sorted_pairs(ball_parts, geometry_parts):
+    if not ball_parts:
+        empty = numpy.empty(0, dtype=numpy.intp)
+        return empty, empty
+    ball_idx = numpy.concatenate(ball_parts)
+    geometry_idx = numpy.concatenate(geometry_parts)
+    order = numpy.lexsort((geometry_idx, ball_idx))
+    return ball_idx[order], geometry_idx[order]
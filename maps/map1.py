@@ -6,7 +6,8 @@ from utils import SCREEN_WIDTH, load_texture
 
 def get_map_layout():
     """
-    Returns two lists (ramps, obstacles) and a dictionary for the finish line.
+    Returns two lists (ramps, obstacles) and a dictionary for the finish line
+    and the named course sections.
     This version includes a new "Convergence Bowl" before the end.
     """
     ramps = []
@@ -99,12 +100,24 @@ def get_map_layout():
     for i in range(len(points_right) - 1):
         ramps.append(Ramp(points_right[i][0], points_right[i][1], points_right[i + 1][0], points_right[i + 1][1]))
 
+    # --- Sections (named course regions, used to attribute stalled balls) ---
+    sections = [
+        {'name': 'opener', 'top': float('-inf'), 'bottom': 800},
+        {'name': 'flippers', 'top': 800, 'bottom': 1840},
+        {'name': 'platforms', 'top': 1840, 'bottom': tunnel_y_start},
+        {'name': 'tunnels', 'top': tunnel_y_start, 'bottom': funnel_y},
+        {'name': 'funnel', 'top': funnel_y, 'bottom': 4000},
+        {'name': 'peg_grid', 'top': 4000, 'bottom': bowl_top_y},
+        {'name': 'bowl', 'top': bowl_top_y, 'bottom': float('inf')},
+    ]
+
     # --- Finish Line ---
     finish_line_texture = load_texture('finish_line.jpg')
     finish_line_data = {
         'y': 5800,
         'height': 50,
-        'texture': finish_line_texture
+        'texture': finish_line_texture,
+        'sections': sections
     }
 
     return ramps, obstacles, finish_line_data
@@ -7,7 +7,8 @@ from utils import SCREEN_WIDTH, load_texture
 
 def get_map_layout(seed=None, difficulty='normal'):
     """
-    Returns two lists (ramps, obstacles) and a dictionary for the finish line.
+    Returns two lists (ramps, obstacles) and a dictionary for the finish line
+    and the named course sections.
     Changes:
       - Seeded RNG for reproducibility (seed=None leaves it random).
       - Difficulty scaling: 'easy' | 'normal' | 'hard'.
@@ -246,12 +247,27 @@ def get_map_layout(seed=None, difficulty='normal'):
     obstacles.append(Obstacle(0, lip_y, lip_len, 12, color=rand_color()))
     obstacles.append(Obstacle(SCREEN_WIDTH - lip_len, lip_y, lip_len, 12, color=rand_color()))
 
+    # --- Sections (named course regions, used to attribute stalled balls) ---
+    sections = [
+        {'name': 'opener', 'top': float('-inf'), 'bottom': 820},
+        {'name': 'flippers', 'top': 820, 'bottom': 1840},
+        {'name': 'platforms', 'top': 1840, 'bottom': chicane_y - 10},
+        {'name': 'chicane', 'top': chicane_y - 10, 'bottom': tunnel_y_start},
+        {'name': 'tunnels', 'top': tunnel_y_start, 'bottom': funnel_y},
+        {'name': 'funnel', 'top': funnel_y, 'bottom': fork_y},
+        {'name': 'fork', 'top': fork_y, 'bottom': y_start},
+        {'name': 'peg_grid', 'top': y_start, 'bottom': lip_y},
+        {'name': 'bowl', 'top': lip_y, 'bottom': bowl_bottom_y},
+        {'name': 'exit', 'top': bowl_bottom_y, 'bottom': float('inf')},
+    ]
+
     # --- Finish line ---
     finish_line_texture = load_texture('finish_line.jpg')
     finish_line_data = {
         'y': bowl_bottom_y + 380,
         'height': 50,
-        'texture': finish_line_texture
+        'texture': finish_line_texture,
+        'sections': sections
     }
 
     return ramps, obstacles, finish_line_data
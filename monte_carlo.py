@@ -0,0 +1,172 @@
+import argparse
+import json
+import os
+import multiprocessing
+import numpy
+from simulate import simulate_race, MAX_TICKS
+from skin_atlas import load_race_skins, refresh_race_skins
+from utils import SCREEN_WIDTH
+
+# Width of the spawn-x buckets used for the win-rate breakdown.
+SPAWN_BUCKET_WIDTH = 48
+# How many races are gathered before a part file is written out.
+RACES_PER_PART = 100
+
+# Skins are decoded once per worker process instead of once per race.
+_worker_skins = None
+
+
+def _init_worker():
+    global _worker_skins
+    _worker_skins = load_race_skins()
+
+
+def section_of(x, y, sections):
+    """Returns the name of the first section containing (x, y), or '' if none does."""
+    for section in sections:
+        if not section['top'] <= y < section['bottom']:
+            continue
+        if 'left' in section and not section['left'] <= x < section['right']:
+            continue
+        return section['name']
+    return ''
+
+
+def run_one(task):
+    """Runs one seeded race in a worker and boils it down to plain per-ball columns."""
+    map_module, seed, difficulty, max_ticks = task
+    map_kwargs = {'difficulty': difficulty} if difficulty else {}
+    result = simulate_race(map_module, seed, map_kwargs, *_worker_skins, max_ticks=max_ticks)
+
+    finish_ticks = {id(ball): tick for ball, tick in result['finishing_order']}
+    winner = result['winner']
+    rows = {
+        'seed': [], 'difficulty': [], 'ball': [], 'spawn_x': [], 'finish_tick': [],
+        'final_x': [], 'final_y': [], 'won': [], 'stall_section': [],
+    }
+    for i, ball in enumerate(result['balls']):
+        tick = finish_ticks.get(id(ball), -1)
+        rows['seed'].append(seed)
+        rows['difficulty'].append(difficulty or '')
+        rows['ball'].append(i)
+        rows['spawn_x'].append(result['spawn_x'][i])
+        rows['finish_tick'].append(tick)
+        rows['final_x'].append(ball.x)
+        rows['final_y'].append(ball.y)
+        rows['won'].append(ball is winner)
+        rows['stall_section'].append(section_of(ball.x, ball.y, result['sections']) if tick < 0 else '')
+    return rows
+
+
+class RaceStats:
+    """Running aggregates over every race seen so far, per difficulty."""
+
+    def __init__(self):
+        self.finish_ticks = {}
+        self.stalls = {}
+        self.ball_count = {}
+        self.spawns = {}
+        self.wins = {}
+
+    def add(self, rows):
+        diff = rows['difficulty'][0]
+        self.ball_count[diff] = self.ball_count.get(diff, 0) + len(rows['ball'])
+        finish = self.finish_ticks.setdefault(diff, [])
+        stalls = self.stalls.setdefault(diff, {})
+        spawns = self.spawns.setdefault(diff, {})
+        wins = self.wins.setdefault(diff, {})
+        for tick, spawn_x, won, section in zip(rows['finish_tick'], rows['spawn_x'], rows['won'], rows['stall_section']):
+            if tick >= 0:
+                finish.append(tick)
+            else:
+                stalls[section] = stalls.get(section, 0) + 1
+            bucket = int(spawn_x // SPAWN_BUCKET_WIDTH) * SPAWN_BUCKET_WIDTH
+            spawns[bucket] = spawns.get(bucket, 0) + 1
+            if won:
+                wins[bucket] = wins.get(bucket, 0) + 1
+
+    def summary(self):
+        out = {}
+        for diff, count in self.ball_count.items():
+            finish = numpy.array(self.finish_ticks[diff])
+            out[diff or 'default'] = {
+                'balls': count,
+                'finish_ticks': {
+                    'p10': float(numpy.percentile(finish, 10)) if finish.size else None,
+                    'p50': float(numpy.percentile(finish, 50)) if finish.size else None,
+                    'p90': float(numpy.percentile(finish, 90)) if finish.size else None,
+                    'histogram': numpy.histogram(finish, bins=20)[0].tolist() if finish.size else [],
+                },
+                'stall_rate': {name or 'unknown': n / count for name, n in sorted(self.stalls[diff].items())},
+                'win_rate_by_spawn_x': {
+                    f"{bucket}-{min(bucket + SPAWN_BUCKET_WIDTH, SCREEN_WIDTH)}": self.wins[diff].get(bucket, 0) / n
+                    for bucket, n in sorted(self.spawns[diff].items())
+                },
+            }
+        return out
+
+
+def write_part(out_dir, part, buffer):
+    """Writes one chunk of rows as a columnar .npz file, one array per column."""
+    columns = {name: numpy.asarray(values) for name, values in buffer.items()}
+    path = os.path.join(out_dir, f"part-{part:05d}.npz")
+    numpy.savez_compressed(path, **columns)
+    return path
+
+
+def run_batch(map_module, seeds, difficulties=(None,), out_dir='monte_carlo_results',
+              processes=None, max_ticks=MAX_TICKS):
+    """
+    Fans seeded races out over a process pool and streams per-ball results
+    into numbered part files under out_dir as they come back.
+    Returns the aggregated summary, which is also written to summary.json.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    tasks = [(map_module, seed, diff, max_ticks) for diff in difficulties for seed in seeds]
+    stats = RaceStats()
+    buffer = None
+    races_in_buffer = 0
+    part = 0
+
+    # Decoded here once, so the workers only read the cached atlas.
+    refresh_race_skins()
+    with multiprocessing.Pool(processes, initializer=_init_worker) as pool:
+        for done, rows in enumerate(pool.imap_unordered(run_one, tasks), start=1):
+            stats.add(rows)
+            if buffer is None:
+                buffer = {name: [] for name in rows}
+            for name, values in rows.items():
+                buffer[name].extend(values)
+            races_in_buffer += 1
+
+            if races_in_buffer == RACES_PER_PART:
+                write_part(out_dir, part, buffer)
+                part += 1
+                buffer = None
+                races_in_buffer = 0
+                print(f"{done}/{len(tasks)} races done")
+
+    if races_in_buffer:
+        write_part(out_dir, part, buffer)
+
+    summary = stats.summary()
+    with open(os.path.join(out_dir, 'summary.json'), 'w') as f:
+        json.dump(summary, f, indent=2)
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run many seeded headless races in parallel for map balancing.")
+    parser.add_argument("map_module", nargs="?", default="map", help="e.g. 'map' or 'maps.map2'")
+    parser.add_argument("--races", type=int, default=1000, help="races per difficulty")
+    parser.add_argument("--first-seed", type=int, default=0)
+    parser.add_argument("--difficulty", nargs="*", help="e.g. easy normal hard (maps.map2 only)")
+    parser.add_argument("--processes", type=int, help="defaults to every core")
+    parser.add_argument("--max-ticks", type=int, default=MAX_TICKS)
+    parser.add_argument("--out", default="monte_carlo_results")
+    args = parser.parse_args()
+
+    seeds = range(args.first_seed, args.first_seed + args.races)
+    result = run_batch(args.map_module, seeds, args.difficulty or (None,), args.out,
+                       args.processes, args.max_ticks)
+    print(json.dumps(result, indent=2))
@@ -0,0 +1,139 @@
+import numpy
+from utils import FRICTION
+
+# Horizontal boost applied on top of friction when a ball leaves a ramp,
+# matching Ramp.collide_with_ball.
+RAMP_BOOST = 1.15
+
+
+class MapGeometry:
+    """Flat arrays of obstacle rectangles and ramp segments for the batched kernels."""
+
+    def __init__(self, ramps, obstacles):
+        self.rect_left = numpy.array([o.rect.left for o in obstacles], dtype=numpy.float64)
+        self.rect_top = numpy.array([o.rect.top for o in obstacles], dtype=numpy.float64)
+        self.rect_right = numpy.array([o.rect.right for o in obstacles], dtype=numpy.float64)
+        self.rect_bottom = numpy.array([o.rect.bottom for o in obstacles], dtype=numpy.float64)
+
+        self.seg_x1 = numpy.array([r.p1.x for r in ramps], dtype=numpy.float64)
+        self.seg_y1 = numpy.array([r.p1.y for r in ramps], dtype=numpy.float64)
+        self.seg_dx = numpy.array([r.direction.x for r in ramps], dtype=numpy.float64)
+        self.seg_dy = numpy.array([r.direction.y for r in ramps], dtype=numpy.float64)
+        self.seg_length_sq = numpy.array([r.length_sq for r in ramps], dtype=numpy.float64)
+        # Vertical extent of each ramp, line width included, for MapIndex.
+        self.seg_top = numpy.array([r.aabb[1] for r in ramps], dtype=numpy.float64)
+        self.seg_bottom = numpy.array([r.aabb[3] for r in ramps], dtype=numpy.float64)
+
+    @classmethod
+    def from_arrays(cls, **arrays):
+        """Builds the geometry straight from precomputed arrays (see map_compiler.py)."""
+        geometry = cls.__new__(cls)
+        geometry.__dict__.update(arrays)
+        return geometry
+
+
+def _first_of_each_ball(ball_idx):
+    """Marks the first pending pair of every ball in a ball-sorted pair list."""
+    first = numpy.ones(ball_idx.size, dtype=bool)
+    first[1:] = ball_idx[1:] != ball_idx[:-1]
+    return first
+
+
+def resolve_rect_pairs(field, ball_idx, rect_idx, geometry):
+    """
+    Resolves (ball, obstacle) candidate pairs against the field's arrays.
+    Pairs must be sorted by ball, then obstacle. Each round handles the next
+    pending pair of every ball at once, so a ball meeting several obstacles
+    sees them in the same order and with the same intermediate state as the
+    sequential Obstacle.collide_with_ball loop.
+    """
+    while ball_idx.size:
+        first = _first_of_each_ball(ball_idx)
+        b = ball_idx[first]
+        o = rect_idx[first]
+        ball_idx = ball_idx[~first]
+        rect_idx = rect_idx[~first]
+
+        x = field.x[b]
+        y = field.y[b]
+        radius = field.radius[b]
+
+        closest_x = numpy.maximum(geometry.rect_left[o], numpy.minimum(x, geometry.rect_right[o]))
+        closest_y = numpy.maximum(geometry.rect_top[o], numpy.minimum(y, geometry.rect_bottom[o]))
+        distance_x = x - closest_x
+        distance_y = y - closest_y
+        distance_squared = distance_x * distance_x + distance_y * distance_y
+
+        hit = (distance_squared < (radius ** 2)) & (distance_squared > 0)
+        if not hit.any():
+            continue
+
+        b = b[hit]
+        distance = numpy.sqrt(distance_squared[hit])
+        overlap = radius[hit] - distance
+        normal_x = distance_x[hit] / distance
+        normal_y = distance_y[hit] / distance
+
+        field.x[b] = x[hit] + normal_x * overlap
+        field.y[b] = y[hit] + normal_y * overlap
+
+        vx = field.vx[b]
+        vy = field.vy[b]
+        dot_product = vx * normal_x + vy * normal_y
+        field.vx[b] = (vx - 2 * dot_product * normal_x) * FRICTION
+        field.vy[b] = (vy - 2 * dot_product * normal_y) * FRICTION
+
+
+def resolve_segment_pairs(field, ball_idx, seg_idx, geometry):
+    """
+    Resolves (ball, ramp) candidate pairs against the field's arrays.
+    Same ordering contract as resolve_rect_pairs; the response matches
+    Ramp.collide_with_ball, including the horizontal boost.
+    """
+    valid = geometry.seg_length_sq[seg_idx] != 0
+    ball_idx = ball_idx[valid]
+    seg_idx = seg_idx[valid]
+
+    while ball_idx.size:
+        first = _first_of_each_ball(ball_idx)
+        b = ball_idx[first]
+        s = seg_idx[first]
+        ball_idx = ball_idx[~first]
+        seg_idx = seg_idx[~first]
+
+        x = field.x[b]
+        y = field.y[b]
+        radius = field.radius[b]
+        x1 = geometry.seg_x1[s]
+        y1 = geometry.seg_y1[s]
+        dx = geometry.seg_dx[s]
+        dy = geometry.seg_dy[s]
+
+        # Closest point on the segment to the ball centre
+        t = ((x - x1) * dx + (y - y1) * dy) / geometry.seg_length_sq[s]
+        t = numpy.clip(t, 0, 1)
+        to_ball_x = x - (x1 + t * dx)
+        to_ball_y = y - (y1 + t * dy)
+        dist_sq = to_ball_x * to_ball_x + to_ball_y * to_ball_y
+
+        hit = (dist_sq < radius ** 2) & (dist_sq > 0)
+        if not hit.any():
+            continue
+
+        b = b[hit]
+        dist = numpy.sqrt(dist_sq[hit])
+        overlap = radius[hit] - dist
+        # Vector2 division multiplies by the reciprocal; doing the same keeps
+        # results bit-identical with the per-ball path.
+        inv_dist = 1 / dist
+        normal_x = to_ball_x[hit] * inv_dist
+        normal_y = to_ball_y[hit] * inv_dist
+
+        field.x[b] = x[hit] + normal_x * overlap
+        field.y[b] = y[hit] + normal_y * overlap
+
+        vx = field.vx[b]
+        vy = field.vy[b]
+        dot_product = vx * normal_x + vy * normal_y
+        field.vx[b] = (vx - 2 * dot_product * normal_x) * FRICTION * RAMP_BOOST
+        field.vy[b] = (vy - 2 * dot_product * normal_y) * FRICTION
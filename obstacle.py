@@ -36,6 +36,23 @@ class Obstacle:
         # Draw the main obstacle rectangle on top of the glow
         pygame.draw.rect(surface, self.color, draw_rect, border_radius=5)
 
+    def draw_premultiplied(self, surface, camera_y):
+        """
+        Same look as draw(), for a transparent surface that is later blitted with
+        BLEND_PREMULTIPLIED. Plain alpha blits onto a transparent target darken
+        the glow, while premultiplied alpha composites exactly like drawing
+        straight onto the screen.
+        """
+        glow_rect_inflated = self.rect.inflate(8, 8)
+        glow_rect_inflated.y -= camera_y
+        glow_surface = pygame.Surface(glow_rect_inflated.size, pygame.SRCALPHA)
+        pygame.draw.rect(glow_surface, (*self.color, 40), glow_surface.get_rect(), border_radius=7)
+        surface.blit(glow_surface.premul_alpha(), glow_rect_inflated.topleft, special_flags=pygame.BLEND_PREMULTIPLIED)
+
+        draw_rect = self.rect.copy()
+        draw_rect.y -= camera_y
+        pygame.draw.rect(surface, self.color, draw_rect, border_radius=5)
+
 
     def collide_with_ball(self, ball):
         """Check and resolve collision with a ball."""
@@ -44,7 +61,7 @@ class Obstacle:
 
         distance_x = ball.x - closest_x
         distance_y = ball.y - closest_y
-        distance_squared = (distance_x ** 2) + (distance_y ** 2)
+        distance_squared = distance_x * distance_x + distance_y * distance_y
 
         if distance_squared < (ball.radius ** 2) and distance_squared > 0:
             distance = math.sqrt(distance_squared)
@@ -56,10 +73,14 @@ class Obstacle:
             ball.x += normal_x * overlap
             ball.y += normal_y * overlap
 
-            dot_product = ball.vx * normal_x + ball.vy * normal_y
+            self.bounce(ball, normal_x, normal_y)
+
+    def bounce(self, ball, normal_x, normal_y):
+        """Reflects the ball's velocity off the obstacle's surface normal."""
+        dot_product = ball.vx * normal_x + ball.vy * normal_y
 
-            ball.vx -= 2 * dot_product * normal_x
-            ball.vy -= 2 * dot_product * normal_y
+        ball.vx -= 2 * dot_product * normal_x
+        ball.vy -= 2 * dot_product * normal_y
 
-            ball.vx *= FRICTION
-            ball.vy *= FRICTION
\ No newline at end of file
+        ball.vx *= FRICTION
+        ball.vy *= FRICTION
\ No newline at end of file
@@ -0,0 +1,165 @@
+import argparse
+import os
+import multiprocessing
+import subprocess
+import tempfile
+import pygame
+import rng
+from background import load_background
+from ball import Ball, draw_balls
+from confetti import ConfettiPool
+from course_cache import CourseTileCache
+from culling import visible
+from map_compiler import load_compiled_map
+from main import draw_rankings, draw_winner_screen, follow_camera
+from ranking import RaceRanking
+from recorder import StreamingRecorder
+from replay import Replay
+from skin_atlas import load_race_skins, refresh_race_skins
+from utils import SCREEN_WIDTH, SCREEN_HEIGHT, BLACK
+
+FPS = 60
+# Same timings as the live game: finish_delay before the winner screen, which
+# then stays up for 15 seconds.
+FINISH_DELAY_TICKS = FPS // 2
+WINNER_SCREEN_FRAMES = 15 * FPS
+
+
+def plan_frames(replay):
+    """
+    Works out every output frame as a (tick, camera_y, confetti_step) tuple.
+    The camera eases after the leader, so it depends on every earlier frame;
+    it is cheap, so it is computed up front and the frames themselves can
+    then be rendered in any order. confetti_step is -1 until the winner screen.
+    """
+    finishing_order = replay.results.get('finishing_order', [])
+    last_tick = replay.ticks - 1
+    if finishing_order:
+        last_tick = min(last_tick, finishing_order[0][1] + FINISH_DELAY_TICKS)
+
+    # The countdown leaves the camera snapped onto the leader.
+    camera_y = replay.positions(0)[:, 1].max() - SCREEN_HEIGHT / 1.5
+    frames = []
+    for tick in range(1, last_tick + 1):
+        camera_y = follow_camera(camera_y, replay.positions(tick)[:, 1].max())
+        frames.append((tick, camera_y, -1))
+
+    if finishing_order:
+        for step in range(WINNER_SCREEN_FRAMES):
+            frames.append((last_tick, camera_y, step))
+    return frames
+
+
+def render_segment(job):
+    """Renders one run of frames headlessly and encodes it as its own segment."""
+    replay_path, frames, segment_path, ffmpeg = job
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    pygame.init()
+    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+
+    font = pygame.font.Font(None, 50)
+    small_font = pygame.font.Font(None, 24)
+    ranking_font = pygame.font.Font(None, 28)
+    trophy_font = pygame.font.SysFont(['Segoe UI Emoji', 'Apple Color Emoji', 'Noto Color Emoji'], 36)
+
+    # --- Rebuild the scene from the replay ---
+    replay = Replay(replay_path)
+    rng.seed_streams(replay.seed)
+    ramps, obstacles, finish_line_props = load_compiled_map(replay.map_id, replay.seed, replay.map_kwargs).build()
+    course_cache = CourseTileCache(ramps, obstacles, finish_line_props)
+    background = load_background()
+
+    skins = {skin['username']: skin for skin in load_race_skins()[0]}
+    balls = []
+    for username in replay.usernames:
+        ball = Ball(0, 0, skins.get(username))
+        ball.username = username
+        balls.append(ball)
+    finishing_order = replay.results.get('finishing_order', [])
+    winner = balls[finishing_order[0][0]] if finishing_order else None
+    ranking = RaceRanking(balls)
+    next_finish = 0
+
+    confetti = None
+    confetti_step = 0
+    video = StreamingRecorder(segment_path, fps=FPS, resolution=(SCREEN_WIDTH, SCREEN_HEIGHT),
+                              policy='block', ffmpeg=ffmpeg)
+    for tick, camera_y, step in frames:
+        for ball, (x, y) in zip(balls, replay.positions(tick)):
+            ball.x = x
+            ball.y = y
+        ranking.update()
+        # The replay already knows who finished when.
+        while next_finish < len(finishing_order) and finishing_order[next_finish][1] <= tick:
+            index, finish_tick = finishing_order[next_finish]
+            ranking.record_finishes([balls[index]], finish_tick)
+            next_finish += 1
+
+        screen.fill(BLACK)
+        background.draw(screen, camera_y)
+        course_cache.draw(screen, camera_y)
+        draw_balls(screen, visible(balls, camera_y), camera_y)
+
+        if step < 0:
+            draw_rankings(screen, ranking.top(3), ranking_font, trophy_font)
+        else:
+            # Confetti always starts from the same seed, so a segment that
+            # begins mid-celebration fast-forwards to the right step.
+            if confetti is None:
+                confetti = ConfettiPool(200)
+            while confetti_step < step:
+                confetti.update()
+                confetti_step += 1
+            confetti.draw(screen)
+            draw_winner_screen(screen, winner, font, small_font)
+
+        video.add_frame(screen)
+
+    code = video.close()
+    pygame.quit()
+    return code
+
+
+def render_replay(replay_path, output_path, processes=None, chunk_frames=600, ffmpeg='ffmpeg'):
+    """
+    Renders a recorded race to video using every core.
+    The frame range is split into chunks, each worker encodes its chunk as a
+    separate segment, and the segments are joined with ffmpeg's concat
+    demuxer without re-encoding.
+    """
+    frames = plan_frames(Replay(replay_path))
+    chunks = [frames[i:i + chunk_frames] for i in range(0, len(frames), chunk_frames)]
+    print(f"Rendering {len(frames)} frames in {len(chunks)} segments...")
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        segments = [os.path.join(work_dir, f"segment_{i:05d}.mp4") for i in range(len(chunks))]
+        jobs = [(replay_path, chunk, segment, ffmpeg) for chunk, segment in zip(chunks, segments)]
+        # Decoded here once, so the workers only read the cached atlas.
+        refresh_race_skins()
+        with multiprocessing.Pool(processes) as pool:
+            codes = pool.map(render_segment, jobs)
+        if any(codes):
+            raise RuntimeError(f"ffmpeg failed on {sum(1 for c in codes if c)} segments")
+
+        list_path = os.path.join(work_dir, "segments.txt")
+        with open(list_path, 'w') as f:
+            for segment in segments:
+                f.write(f"file '{segment}'\n")
+        subprocess.run([
+            ffmpeg, "-y", "-loglevel", "error",
+            "-f", "concat", "-safe", "0", "-i", list_path,
+            "-c", "copy",  # Segments share one encoding, so they are joined as-is
+            output_path
+        ], check=True)
+
+    print(f"Video saved as '{output_path}'")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render a recorded race replay to video in parallel.")
+    parser.add_argument("replay", help="replay file written by simulate.py --record")
+    parser.add_argument("output", nargs="?", default="replay_render.mp4")
+    parser.add_argument("--processes", type=int, help="defaults to every core")
+    parser.add_argument("--chunk-frames", type=int, default=600)
+    args = parser.parse_args()
+    render_replay(args.replay, args.output, args.processes, args.chunk_frames)
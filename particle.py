@@ -1,27 +1,96 @@
 import pygame
-import random
-from utils import SPARKLE_COLORS
-
-class Particle:
-    """Represents a single sparkle particle for collision effects."""
-    def __init__(self, x, y):
-        self.x = x
-        self.y = y
-        self.vx = random.uniform(-3, 3)
-        self.vy = random.uniform(-3, 3)
-        self.lifespan = random.randint(20, 40)
-        self.color = random.choice(SPARKLE_COLORS)
-        self.radius = random.randint(2, 5)
+import numpy
+import rng
+from utils import SPARKLE_COLORS, SCREEN_HEIGHT
+
+MAX_LIFESPAN = 40
+# Particles are spawned with a radius up to this and only shrink from there.
+MAX_RADIUS = 5
+
+
+class ParticlePool:
+    """
+    Fixed-capacity pool of sparkle particles for collision effects.
+    Every particle lives in a slot of a set of NumPy arrays; updating ages and
+    moves them all at once and compaction keeps the live ones packed at the
+    front, so a pile-up never allocates Python objects per sparkle.
+    """
+
+    def __init__(self, capacity=4096, emission_budget=256):
+        self.capacity = capacity
+        # Cap on new particles per frame, so a big pile-up can't flood the pool.
+        self.emission_budget = emission_budget
+        self.x = numpy.zeros(capacity, dtype=numpy.float32)
+        self.y = numpy.zeros(capacity, dtype=numpy.float32)
+        self.vx = numpy.zeros(capacity, dtype=numpy.float32)
+        self.vy = numpy.zeros(capacity, dtype=numpy.float32)
+        self.lifespan = numpy.zeros(capacity, dtype=numpy.int16)
+        self.color = numpy.zeros(capacity, dtype=numpy.uint8)
+        self.radius = numpy.zeros(capacity, dtype=numpy.uint8)
+        self.count = 0
+        self.emitted = 0
+        # One sprite per colour and radius, indexed [color][radius]; radius 0 is never drawn.
+        self.sprites = [
+            [None] + [self._make_sprite(color, radius) for radius in range(1, MAX_RADIUS + 1)]
+            for color in SPARKLE_COLORS
+        ]
+
+    def __len__(self):
+        return self.count
+
+    def emit(self, x, y, count):
+        """Spawns up to count particles at (x, y), within this frame's budget."""
+        count = min(count, self.emission_budget - self.emitted, self.capacity - self.count)
+        if count <= 0:
+            return
+        random = rng.stream('particles')
+        for i in range(self.count, self.count + count):
+            self.x[i] = x
+            self.y[i] = y
+            self.vx[i] = random.uniform(-3, 3)
+            self.vy[i] = random.uniform(-3, 3)
+            self.lifespan[i] = random.randint(20, MAX_LIFESPAN)
+            self.color[i] = random.randrange(len(SPARKLE_COLORS))
+            self.radius[i] = random.randint(2, MAX_RADIUS)
+        self.count += count
+        self.emitted += count
 
     def update(self):
-        """Update particle's position and decrease its lifespan."""
-        self.x += self.vx
-        self.y += self.vy
-        self.lifespan -= 1
+        """Moves and ages every particle, then packs the survivors to the front."""
+        n = self.count
+        self.x[:n] += self.vx[:n]
+        self.y[:n] += self.vy[:n]
+        self.lifespan[:n] -= 1
+
+        alive = self.lifespan[:n] > 0
+        survivors = int(numpy.count_nonzero(alive))
+        if survivors != n:
+            for array in (self.x, self.y, self.vx, self.vy, self.lifespan, self.color, self.radius):
+                array[:survivors] = array[:n][alive]
+        self.count = survivors
+        self.emitted = 0
+
+    @staticmethod
+    def _make_sprite(color, radius):
+        sprite = pygame.Surface((radius * 2, radius * 2), pygame.SRCALPHA)
+        pygame.draw.circle(sprite, color, (radius, radius), radius)
+        return sprite
 
     def draw(self, surface, camera_y):
-        """Draw the particle, adjusted for camera position."""
-        current_radius = int(self.radius * (self.lifespan / 40))
-        if current_radius > 0:
-            pos = (int(self.x), int(self.y - camera_y))
-            pygame.draw.circle(surface, self.color, pos, current_radius)
+        """Draws the particles in view with one batched blit."""
+        n = self.count
+        # Particles shrink as they age.
+        current_radius = (self.radius[:n] * (self.lifespan[:n] / MAX_LIFESPAN)).astype(numpy.int32)
+        x = self.x[:n].astype(numpy.int32)
+        y = (self.y[:n] - camera_y).astype(numpy.int32)
+        shown = (current_radius > 0) & (y + current_radius > 0) & (y - current_radius < SCREEN_HEIGHT)
+
+        radii = current_radius[shown]
+        colors = self.color[:n][shown].tolist()
+        left = (x[shown] - radii).tolist()
+        top = (y[shown] - radii).tolist()
+        sprites = self.sprites
+        surface.blits([
+            (sprites[color][radius], (px, py))
+            for color, radius, px, py in zip(colors, radii.tolist(), left, top)
+        ], doreturn=False)
@@ -0,0 +1,114 @@
+import json
+import time
+from collections import deque
+import numpy
+import pygame
+from utils import SCREEN_WIDTH, WHITE
+
+
+class _Phase:
+    """Context manager that times one named phase for its PhaseTimer."""
+
+    def __init__(self, timer, name):
+        self.timer = timer
+        self.name = name
+        self.samples = deque(maxlen=timer.window)
+        self.start = 0
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter_ns()
+        self.samples.append(end - self.start)
+        if self.timer.trace is not None:
+            self.timer.trace.append((self.name, self.start, end - self.start))
+        return False
+
+
+class _NoPhase:
+    """Stand-in used while timing is off, so a timed block costs one method call."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NO_PHASE = _NoPhase()
+
+
+class PhaseTimer:
+    """
+    Per-frame timing of the game loop's phases.
+    Wrap each phase in `with timer.phase("name"):`. The last `window`
+    samples of every phase are kept for the rolling p50/p99 shown by
+    draw_hud, and with tracing on every sample is also kept for
+    save_trace, which writes Chrome trace-event JSON (open it in
+    chrome://tracing or Perfetto).
+    While disabled, phase() hands back a shared no-op context manager.
+    """
+
+    def __init__(self, enabled=False, window=120, trace=False):
+        self.enabled = enabled
+        self.window = window
+        self.phases = {}
+        self.trace = [] if enabled and trace else None
+        self.origin = time.perf_counter_ns()
+        self._hud = None
+        self._hud_frame = 0
+
+    def phase(self, name):
+        if not self.enabled:
+            return _NO_PHASE
+        phase = self.phases.get(name)
+        if phase is None:
+            phase = self.phases[name] = _Phase(self, name)
+        return phase
+
+    def stats(self):
+        """Returns {phase: (p50_ms, p99_ms)} over the rolling window."""
+        out = {}
+        for name, phase in self.phases.items():
+            if phase.samples:
+                p50, p99 = numpy.percentile(numpy.array(phase.samples) / 1e6, (50, 99))
+                out[name] = (float(p50), float(p99))
+        return out
+
+    def draw_hud(self, surface, font, refresh_every=15):
+        """Draws the rolling p50/p99 of every phase in the top right corner."""
+        if not self.enabled:
+            return
+        # Rebuilding the text every frame would itself show up in the numbers.
+        if self._hud is None or self._hud_frame % refresh_every == 0:
+            lines = [font.render(f"{'phase':<12}{'p50':>7}{'p99':>7} ms", True, WHITE)]
+            for name, (p50, p99) in self.stats().items():
+                lines.append(font.render(f"{name:<12}{p50:>7.2f}{p99:>7.2f}", True, WHITE))
+            width = max(line.get_width() for line in lines) + 10
+            height = sum(line.get_height() for line in lines) + 10
+            self._hud = pygame.Surface((width, height), pygame.SRCALPHA)
+            self._hud.fill((0, 0, 0, 160))
+            y = 5
+            for line in lines:
+                self._hud.blit(line, (5, y))
+                y += line.get_height()
+        self._hud_frame += 1
+        surface.blit(self._hud, (SCREEN_WIDTH - self._hud.get_width() - 5, 5))
+
+    def save_trace(self, path):
+        """Writes every recorded phase as Chrome trace-event JSON."""
+        if self.trace is None:
+            return
+        events = [
+            {'name': name, 'ph': 'X', 'ts': (start - self.origin) / 1000, 'dur': duration / 1000, 'pid': 0, 'tid': 0}
+            for name, start, duration in self.trace
+        ]
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+        print(f"Frame trace saved as '{path}' ({len(events)} events)")
+
+
+# Shared disabled timer for code paths that take an optional timer.
+NO_TIMER = PhaseTimer()
@@ -0,0 +1,97 @@
+import rng
+from ball import Ball
+from profiler import NO_TIMER
+from spatial_grid import SpatialGrid
+from utils import SCREEN_WIDTH, SCREEN_HEIGHT, BALL_RADIUS, NUM_BALLS, NUM_NEW_BALLS
+
+
+def spawn_balls(ball_skins, new_ball_skins):
+    """Creates the field of balls in a cluster just above the top of the course."""
+    random = rng.stream('spawn')
+    balls = []
+    for i in range(NUM_BALLS):
+        x_pos = random.randint(BALL_RADIUS, SCREEN_WIDTH - BALL_RADIUS)
+        # Balls now spawn in a tighter cluster at the top of the screen
+        y_pos = random.randint(-SCREEN_HEIGHT // 4, -BALL_RADIUS * 2)
+        skin_info = ball_skins[i % len(ball_skins)] if ball_skins else None
+        balls.append(Ball(x_pos, y_pos, skin_info))
+    for i in range(NUM_NEW_BALLS):
+        x_pos = random.randint(BALL_RADIUS, SCREEN_WIDTH - BALL_RADIUS)
+        # Balls now spawn in a tighter cluster at the top of the screen
+        y_pos = random.randint(-SCREEN_HEIGHT // 4, -BALL_RADIUS * 2)
+        new_skin_info = new_ball_skins[i % len(new_ball_skins)] if new_ball_skins else None
+        balls.append(Ball(x_pos, y_pos, new_skin_info))
+    return balls
+
+
+def step_physics(balls, particles, obstacles, ramps, map_index=None, grid=None, timer=NO_TIMER, dt=None,
+                 field=None):
+    """
+    Advances balls and the particle pool by one tick.
+    particles may be None when nothing is drawn, e.g. in headless runs.
+    timer is an optional PhaseTimer (see profiler.py).
+    Awake balls are integrated; sleeping ones replay their resting cycle (see
+    Ball.settle), which lands on exactly the positions integrating them would,
+    and retired ones are skipped.
+    With dt set, each tick covers dt frames using adaptive substeps and swept
+    collisions (see Ball.update_adaptive); by default it is the plain one
+    frame step the game runs.
+    With field set, balls must be its FieldBalls, and the awake ones are
+    integrated together in its arrays (see ball_field.py) instead of one at a
+    time. It only takes the plain step, not dt.
+    """
+    in_play = [ball for ball in balls if not ball.retired]
+    awake = [ball for ball in in_play if not ball.asleep]
+    with timer.phase("physics"):
+        if field is not None:
+            if dt is not None:
+                raise ValueError("BallField only takes the plain one frame step; step it without dt.")
+            field.step(obstacles, ramps, map_index)
+        elif dt is None:
+            for ball in awake:
+                ball.update(obstacles, ramps, map_index)
+        else:
+            for ball in awake:
+                ball.update_adaptive(obstacles, ramps, map_index, dt)
+        for ball in in_play:
+            if ball.asleep:
+                ball.replay_rest()
+    if particles is not None:
+        with timer.phase("particles"):
+            particles.update()
+    with timer.phase("collisions"):
+        handle_ball_collisions(in_play, particles, grid)
+        for ball in awake:
+            ball.settle()
+
+
+def handle_ball_collisions(balls, particles=None, grid=None):
+    """
+    Resolves ball-vs-ball contacts for the pairs the broadphase finds nearby.
+    Sleeping balls collide like any other, and any real contact wakes them,
+    so sleep never changes how a race plays out. Every ball's touched flag
+    says whether it was in contact this tick.
+    """
+    if grid is None:
+        grid = SpatialGrid()
+    grid.rebuild(balls)
+    for ball in balls:
+        ball.touched = False
+    for i, j in grid.candidate_pairs():
+        ball, other = balls[i], balls[j]
+        if ball.collide_with_ball(other, particles):
+            ball.touched = other.touched = True
+            if ball.asleep:
+                ball.wake()
+            if other.asleep:
+                other.wake()
+
+
+def retire_finished(balls, finish_y):
+    """Retires the balls that have crossed finish_y and returns them, in ball order."""
+    finished = []
+    for ball in balls:
+        if not ball.retired and ball.y + ball.radius > finish_y:
+            ball.retire()
+            finished.append(ball)
+    return finished
@@ -12,6 +12,17 @@ class Ramp:
         self.thickness = thickness
         self.color = OBSTACLE_COLOR
 
+        # Ramps never move, so the segment maths is precomputed once.
+        self.direction = self.p2 - self.p1
+        self.length_sq = self.direction.length_squared()
+        # Plain floats for collide_with_ball, which runs for every nearby ball every tick.
+        self.x1 = float(x1)
+        self.y1 = float(y1)
+        self.dx = self.direction.x
+        self.dy = self.direction.y
+        half = thickness / 2
+        self.aabb = (min(x1, x2) - half, min(y1, y2) - half, max(x1, x2) + half, max(y1, y2) + half)
+
     def draw(self, surface, camera_y):
         """Draw the ramp, adjusted for camera position."""
         p1_screen = (self.p1.x, self.p1.y - camera_y)
@@ -20,48 +31,49 @@ class Ramp:
 
     def collide_with_ball(self, ball):
         """Check and resolve collision with a ball."""
-        ball_pos = pygame.math.Vector2(ball.x, ball.y)
-        line_vec = self.p2 - self.p1
-
         # Handle case of zero-length ramp to avoid division by zero
-        if line_vec.length_squared() == 0:
+        if self.length_sq == 0:
             return
 
+        # Scalar maths throughout; no Vector2 is built per call.
+        dx = self.dx
+        dy = self.dy
+
         # Find the projection of the ball's position onto the line
-        p1_to_ball = ball_pos - self.p1
-        t = p1_to_ball.dot(line_vec) / line_vec.length_squared()
+        t = ((ball.x - self.x1) * dx + (ball.y - self.y1) * dy) / self.length_sq
 
         # Clamp t to be on the line segment [0, 1]
         t = max(0, min(1, t))
 
-        # Find the closest point on the line segment to the ball
-        closest_point = self.p1 + t * line_vec
-
-        # Vector from closest point to ball center
-        vec_to_ball = ball_pos - closest_point
-        dist_sq = vec_to_ball.length_squared()
+        # Vector from the closest point on the segment to the ball center
+        to_ball_x = ball.x - (self.x1 + t * dx)
+        to_ball_y = ball.y - (self.y1 + t * dy)
+        dist_sq = to_ball_x * to_ball_x + to_ball_y * to_ball_y
 
         # If the distance is less than the ball's radius, there's a collision
         if dist_sq < ball.radius ** 2 and dist_sq > 0:
             dist = math.sqrt(dist_sq)
             overlap = ball.radius - dist
 
-            # The collision normal is the direction from the closest point to the ball
-            normal = vec_to_ball / dist
+            # The collision normal is the direction from the closest point to
+            # the ball. Multiplying by the reciprocal matches what Vector2
+            # division did, so results are unchanged bit for bit.
+            inv_dist = 1 / dist
+            normal_x = to_ball_x * inv_dist
+            normal_y = to_ball_y * inv_dist
 
             # Reposition the ball to be just outside the ramp
-            ball.x += normal.x * overlap
-            ball.y += normal.y * overlap
-
-            # --- Bounce Physics ---
-            ball_vel = pygame.math.Vector2(ball.vx, ball.vy)
+            ball.x += normal_x * overlap
+            ball.y += normal_y * overlap
 
-            # Calculate the dot product of the velocity and the normal
-            dot_product = ball_vel.dot(normal)
+            self.bounce(ball, normal_x, normal_y)
 
-            # Reflect the velocity vector
-            new_vel = ball_vel - 2 * dot_product * normal
+    def bounce(self, ball, normal_x, normal_y):
+        """Reflects the ball's velocity off the ramp, given the unit normal pointing at the ball."""
+        # --- Bounce Physics ---
+        # Calculate the dot product of the velocity and the normal
+        dot_product = ball.vx * normal_x + ball.vy * normal_y
 
-            # Apply friction
-            ball.vx = new_vel.x * FRICTION * 1.15
-            ball.vy = new_vel.y * FRICTION
+        # Reflect the velocity, then apply friction
+        ball.vx = (ball.vx - 2 * dot_product * normal_x) * FRICTION * 1.15
+        ball.vy = (ball.vy - 2 * dot_product * normal_y) * FRICTION
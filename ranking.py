@@ -0,0 +1,50 @@
+class RaceRanking:
+    """
+    Live order of the field, kept up to date incrementally.
+    Balls still racing are kept sorted by how far down the course they are.
+    Between two ticks only a few neighbours swap places, so one insertion
+    sort pass over the already sorted list costs about one comparison per
+    ball. Balls that cross the finish line are moved to the finishing order
+    with the tick they finished on, and always rank ahead of the rest.
+    """
+
+    def __init__(self, balls):
+        self.running = sorted(balls, key=lambda b: b.y, reverse=True)
+        self.finished = []
+        self._deepest_finished = None
+
+    def update(self):
+        """Re-sorts the running balls after they moved; call once per tick."""
+        order = self.running
+        for i in range(1, len(order)):
+            ball = order[i]
+            y = ball.y
+            j = i
+            while j > 0 and order[j - 1].y < y:
+                order[j] = order[j - 1]
+                j -= 1
+            if j != i:
+                order[j] = ball
+
+    def record_finishes(self, balls, tick):
+        """Moves balls that crossed the line on this tick to the finishing order, deepest first."""
+        for ball in sorted(balls, key=lambda b: b.y, reverse=True):
+            self.running.remove(ball)
+            self.finished.append((ball, tick))
+            if self._deepest_finished is None or ball.y > self._deepest_finished.y:
+                self._deepest_finished = ball
+
+    def leader(self):
+        """The ball furthest down the course, finished or not, e.g. for the camera."""
+        leader = self.running[0] if self.running else None
+        if leader is None or (self._deepest_finished is not None and self._deepest_finished.y > leader.y):
+            return self._deepest_finished
+        return leader
+
+    def winner(self):
+        return self.finished[0][0] if self.finished else None
+
+    def top(self, k):
+        """The first k balls of the race: finishers in finishing order, then the rest by position."""
+        top = [ball for ball, _ in self.finished[:k]]
+        return top + self.running[:k - len(top)]
@@ -0,0 +1,198 @@
+import queue
+import socket
+import subprocess
+import threading
+import time
+import pygame
+
+# What add_frame does when the encoder falls behind and the queue is full:
+#   'block'     - wait for room (no frames lost, the game loop may stall)
+#   'drop'      - throw the frame away (the video, and any audio, gets shorter)
+#   'duplicate' - throw it away but repeat the next frame in its place,
+#                 so the video keeps the right length and timing
+POLICIES = ('block', 'drop', 'duplicate')
+
+
+# ffmpeg raw PCM formats for the sample formats pygame.mixer can run with.
+PCM_FORMATS = {8: 'u8', -8: 's8', 16: 'u16le', -16: 's16le', 32: 'f32le'}
+
+
+class StreamingRecorder:
+    """
+    Streams frames to a local ffmpeg process from a background thread.
+    The game loop only grabs the raw RGB bytes of the screen and hands them to
+    a bounded queue; the worker pipes them into ffmpeg as they arrive, so
+    memory stays flat however long the race is.
+
+    With audio_path set, the track is muxed in the same ffmpeg run. Each
+    frame says whether the music is playing, and the matching slice of
+    decoded samples (or silence) is streamed alongside it, so the audio
+    follows the race's intro/countdown/race/finish timeline exactly.
+    """
+
+    def __init__(self, path, fps, resolution, queue_size=120, policy='duplicate', ffmpeg='ffmpeg', audio_path=None):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown frame policy '{policy}', expected one of {POLICIES}")
+        self.policy = policy
+        self.resolution = resolution
+        self.frames_written = 0
+        self.dropped = 0
+        self.error = None
+        self._pending_duplicates = 0
+        self._last_frame = None
+
+        width, height = resolution
+        command = [
+            ffmpeg, "-y", "-loglevel", "error",
+            "-f", "rawvideo", "-pix_fmt", "rgb24", "-s", f"{width}x{height}", "-r", str(fps),
+            "-i", "-",  # Raw frames arrive on stdin
+        ]
+
+        self.audio_queue = None
+        if audio_path:
+            self._load_audio(audio_path, fps)
+            # PCM goes over a local socket rather than a second pipe, which
+            # works the same on every platform.
+            self.audio_port = _free_port()
+            command += [
+                "-f", PCM_FORMATS[self.audio_format], "-ar", str(self.sample_rate), "-ac", str(self.channels),
+                "-i", f"tcp://127.0.0.1:{self.audio_port}?listen=1",
+                "-c:a", "aac", "-shortest",
+            ]
+        command += ["-c:v", "libx264", "-pix_fmt", "yuv420p", path]
+        self.process = subprocess.Popen(command, stdin=subprocess.PIPE)
+
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.worker = threading.Thread(target=self._run, name="video-encoder", daemon=True)
+        self.worker.start()
+
+        if audio_path:
+            # Audio chunks are tiny, so their queue is unbounded.
+            self.audio_queue = queue.Queue()
+            self.audio_worker = threading.Thread(target=self._run_audio, name="audio-encoder", daemon=True)
+            self.audio_worker.start()
+
+    def _load_audio(self, audio_path, fps):
+        if pygame.mixer.get_init() is None:
+            pygame.mixer.init()
+        self.sample_rate, self.audio_format, self.channels = pygame.mixer.get_init()
+        self.samples = pygame.mixer.Sound(audio_path).get_raw()
+        self.bytes_per_sample = abs(self.audio_format) // 8 * self.channels
+        self.fps = fps
+        self.audio_frames = 0
+        self.audio_cursor = 0
+        self.silence_byte = b'\x80' if self.audio_format == 8 else b'\x00'
+
+    def add_frame(self, surface, audio_playing=False):
+        """Queues a copy of the surface as the next video frame."""
+        if self.error:
+            return
+        frame = pygame.image.tobytes(surface, 'RGB')
+        self._last_frame = frame
+        if self.policy == 'block':
+            self.queue.put((frame, 1))
+            self._add_audio(audio_playing)
+            return
+
+        repeat = 1 + self._pending_duplicates
+        try:
+            self.queue.put_nowait((frame, repeat))
+            self._pending_duplicates = 0
+        except queue.Full:
+            self.dropped += 1
+            if self.policy == 'duplicate':
+                self._pending_duplicates += 1
+            else:
+                # The frame is gone from the video, so its slice of the
+                # track is skipped too and the two stay in step.
+                self._add_audio(audio_playing, keep=False)
+                return
+        self._add_audio(audio_playing)
+
+    def _add_audio(self, playing, keep=True):
+        if self.audio_queue is None:
+            return
+        # Sample counts are derived from the frame count so rounding never drifts.
+        start = self.audio_frames * self.sample_rate // self.fps
+        self.audio_frames += 1
+        count = self.audio_frames * self.sample_rate // self.fps - start
+        size = count * self.bytes_per_sample
+
+        chunk = b''
+        if playing:
+            chunk = self.samples[self.audio_cursor:self.audio_cursor + size]
+            self.audio_cursor += len(chunk)
+        if keep:
+            self.audio_queue.put(chunk + self.silence_byte * (size - len(chunk)))
+
+    def _run_audio(self):
+        connection = None
+        deadline = time.monotonic() + 10
+        while connection is None:
+            try:
+                connection = socket.create_connection(("127.0.0.1", self.audio_port))
+            except OSError as e:
+                # ffmpeg opens its inputs in order; wait for it to start listening.
+                if time.monotonic() > deadline or self.process.poll() is not None:
+                    self.error = e
+                    # ffmpeg would otherwise keep listening for the audio
+                    # input and close() would wait on it forever.
+                    if self.process.poll() is None:
+                        self.process.terminate()
+                    return
+                time.sleep(0.05)
+
+        with connection:
+            while True:
+                chunk = self.audio_queue.get()
+                if chunk is None:
+                    break
+                try:
+                    connection.sendall(chunk)
+                except OSError as e:
+                    self.error = e
+                    break
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            frame, repeat = item
+            try:
+                for _ in range(repeat):
+                    self.process.stdin.write(frame)
+                self.frames_written += repeat
+            except (BrokenPipeError, OSError) as e:
+                self.error = e
+                break
+
+    def close(self):
+        """Flushes the queue, waits for ffmpeg to finish and returns its exit code."""
+        if self._pending_duplicates:
+            self.queue.put((self._last_frame, self._pending_duplicates))
+            self._pending_duplicates = 0
+        self.queue.put(None)
+        self.worker.join()
+        if self.audio_queue is not None:
+            self.audio_queue.put(None)
+            self.audio_worker.join()
+        try:
+            self.process.stdin.close()
+        except (BrokenPipeError, OSError):
+            pass
+        code = self.process.wait()
+
+        if self.error:
+            print(f"Recording stopped early: {self.error}")
+        if self.dropped:
+            action = "duplicated in their place" if self.policy == 'duplicate' else "lost"
+            print(f"Encoder fell behind: {self.dropped} frames dropped ({action}).")
+        print(f"Wrote {self.frames_written} frames.")
+        return code
+
+
+def _free_port():
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
@@ -0,0 +1,166 @@
+import json
+import struct
+import zlib
+import numpy
+
+# --- File layout ---
+# header:  magic, version, seed, keyframe interval, position scale, ball count,
+#          then a JSON blob with the map id, map kwargs and skin order
+# blocks:  zlib-compressed runs of frames, each run starting with a keyframe
+# footer:  block table (first tick, offset, length), tick count, JSON results
+# trailer: footer offset and end magic, so the footer can be found by seeking
+MAGIC = b'BFRP'
+END_MAGIC = b'BFRE'
+VERSION = 1
+HEADER = struct.Struct('<4sHqHHI')
+BLOCK_ENTRY = struct.Struct('<IQI')
+TRAILER = struct.Struct('<Q4s')
+
+KEYFRAME = 0
+DELTA = 1
+
+# Positions are stored as fixed point with 1/16 px precision.
+POSITION_SCALE = 16
+INT16_MAX = 32767
+
+
+def _quantize(balls):
+    positions = numpy.empty((len(balls), 2), dtype=numpy.int32)
+    for i, ball in enumerate(balls):
+        positions[i, 0] = round(ball.x * POSITION_SCALE)
+        positions[i, 1] = round(ball.y * POSITION_SCALE)
+    return positions
+
+
+class ReplayRecorder:
+    """
+    Writes a race as a compact binary event log.
+    Every tick stores the quantized ball positions as int16 deltas from the
+    previous tick; a full int32 keyframe starts every block (and any frame
+    whose delta would not fit), so playback can seek to a block directly.
+    """
+
+    def __init__(self, path, seed, map_id, map_kwargs, usernames, keyframe_interval=60):
+        self.file = open(path, 'wb')
+        self.keyframe_interval = keyframe_interval
+        self.ball_count = len(usernames)
+        self.blocks = []
+        self.pending = []
+        self.block_first_tick = 0
+        self.previous = None
+        self.ticks = 0
+
+        meta = json.dumps({'map': map_id, 'map_kwargs': map_kwargs or {}, 'usernames': usernames}).encode()
+        self.file.write(HEADER.pack(MAGIC, VERSION, seed, keyframe_interval, POSITION_SCALE, self.ball_count))
+        self.file.write(struct.pack('<I', len(meta)))
+        self.file.write(meta)
+
+    def record(self, balls):
+        """Appends the current state of every ball as the next tick."""
+        positions = _quantize(balls)
+        if self.ticks % self.keyframe_interval == 0:
+            self._flush_block()
+            self.block_first_tick = self.ticks
+
+        delta = None if self.previous is None or not self.pending else positions - self.previous
+        if delta is None or numpy.abs(delta).max(initial=0) > INT16_MAX:
+            self.pending.append(bytes([KEYFRAME]) + positions.tobytes())
+        else:
+            self.pending.append(bytes([DELTA]) + delta.astype(numpy.int16).tobytes())
+
+        self.previous = positions
+        self.ticks += 1
+
+    def _flush_block(self):
+        if not self.pending:
+            return
+        data = zlib.compress(b''.join(self.pending))
+        self.blocks.append((self.block_first_tick, self.file.tell(), len(data)))
+        self.file.write(data)
+        self.pending = []
+
+    def close(self, results=None):
+        """Writes the block table and optional results (e.g. the finishing order)."""
+        self._flush_block()
+        footer_offset = self.file.tell()
+        self.file.write(struct.pack('<I', len(self.blocks)))
+        for entry in self.blocks:
+            self.file.write(BLOCK_ENTRY.pack(*entry))
+        results_blob = json.dumps(results or {}).encode()
+        self.file.write(struct.pack('<II', self.ticks, len(results_blob)))
+        self.file.write(results_blob)
+        self.file.write(TRAILER.pack(footer_offset, END_MAGIC))
+        self.file.close()
+
+
+class Replay:
+    """Seekable reader for a file written by ReplayRecorder."""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self.data = f.read()
+
+        magic, version, self.seed, self.keyframe_interval, self.scale, self.ball_count = \
+            HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"'{path}' is not a version {VERSION} race replay")
+        offset = HEADER.size
+        (meta_length,) = struct.unpack_from('<I', self.data, offset)
+        meta = json.loads(self.data[offset + 4:offset + 4 + meta_length])
+        self.map_id = meta['map']
+        self.map_kwargs = meta['map_kwargs']
+        self.usernames = meta['usernames']
+
+        footer_offset, end_magic = TRAILER.unpack_from(self.data, len(self.data) - TRAILER.size)
+        if end_magic != END_MAGIC:
+            raise ValueError(f"'{path}' is truncated")
+        (block_count,) = struct.unpack_from('<I', self.data, footer_offset)
+        offset = footer_offset + 4
+        self.blocks = []
+        for _ in range(block_count):
+            self.blocks.append(BLOCK_ENTRY.unpack_from(self.data, offset))
+            offset += BLOCK_ENTRY.size
+        self.ticks, results_length = struct.unpack_from('<II', self.data, offset)
+        offset += 8
+        self.results = json.loads(self.data[offset:offset + results_length])
+
+        self._cached_block = None
+        self._cached_frames = None
+
+    def __len__(self):
+        return self.ticks
+
+    def _decode_block(self, block):
+        if block == self._cached_block:
+            return self._cached_frames
+        _, offset, length = self.blocks[block]
+        raw = zlib.decompress(self.data[offset:offset + length])
+
+        frames = []
+        count = self.ball_count * 2
+        position = 0
+        current = None
+        while position < len(raw):
+            kind = raw[position]
+            position += 1
+            if kind == KEYFRAME:
+                current = numpy.frombuffer(raw, dtype=numpy.int32, count=count, offset=position).copy()
+                position += count * 4
+            else:
+                delta = numpy.frombuffer(raw, dtype=numpy.int16, count=count, offset=position)
+                current = current + delta
+                position += count * 2
+            frames.append(current)
+
+        self._cached_block = block
+        self._cached_frames = frames
+        return frames
+
+    def positions(self, tick):
+        """Returns an (n, 2) float array of ball positions at the given tick."""
+        if not 0 <= tick < self.ticks:
+            raise IndexError(f"tick {tick} is outside the replay (0..{self.ticks - 1})")
+        block = tick // self.keyframe_interval
+        frames = self._decode_block(block)
+        quantized = frames[tick - self.blocks[block][0]]
+        return quantized.reshape(self.ball_count, 2) / self.scale
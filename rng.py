@@ -0,0 +1,34 @@
+import random
+
+# One independent random stream per subsystem, so that for example a burst of
+# collision sparkles can never shift where the next ball spawns.
+STREAM_NAMES = ('spawn', 'map', 'particles', 'confetti')
+
+_streams = {name: random.Random() for name in STREAM_NAMES}
+
+
+def stream(name):
+    """Returns the random.Random instance for a subsystem."""
+    return _streams[name]
+
+
+def seed_streams(seed):
+    """
+    Seeds every stream from one race seed.
+    Each stream gets its own derived seed, so the streams stay independent
+    of each other while the whole race is reproducible from the single seed.
+    """
+    for name, generator in _streams.items():
+        generator.seed(f"{seed}:{name}")
+
+
+def seed_map_generation(seed=None):
+    """
+    The map modules draw from the global random module, so it is seeded from
+    the map stream right before a layout is built. With seed given, the map
+    stream is first reset as seed_streams(seed) would, so a layout can be
+    rebuilt on its own without touching the other streams.
+    """
+    if seed is not None:
+        _streams['map'].seed(f"{seed}:map")
+    random.seed(_streams['map'].getrandbits(64))
@@ -1,20 +1,14 @@
 import os
-import requests
-import re
 from TikTokApi import TikTokApi
+from downloader import AvatarDownloader
 
 # --- Configuration ---
 # The folder where profile pictures will be saved.
 SKINS_FOLDER = "skins"
 # How many followers you want to attempt to download.
-MAX_FOLLOWERS_TO_FETCH = 10
-
-
-def sanitize_filename(username):
-    """
-    Removes characters from a username that are not allowed in filenames.
-    """
-    return re.sub(r'[\\/*?:"<>|]', "", username)
+MAX_FOLLOWERS_TO_FETCH = 1000
+# How many avatars are downloaded at the same time.
+DOWNLOAD_WORKERS = 16
 
 
 def download_profile_pictures(username):
@@ -28,7 +22,7 @@ def download_profile_pictures(username):
         print(f"Creating directory: {SKINS_FOLDER}")
         os.makedirs(SKINS_FOLDER)
 
-    downloaded_count = 0
+    counts = {'downloaded': 0, 'skipped': 0, 'failed': 0}
 
     try:
         # Initialize the API directly without a 'with' statement.
@@ -42,32 +36,14 @@ def download_profile_pictures(username):
         print("-" * 30)
 
         # The .followers() method is a generator that yields user data.
-        for i, follower in enumerate(user.followers(count=MAX_FOLLOWERS_TO_FETCH)):
-            follower_username = follower.username
-            image_url = follower.avatar_larger
-
-            filename = sanitize_filename(follower_username) + ".jpg"
-            filepath = os.path.join(SKINS_FOLDER, filename)
-
-            if os.path.exists(filepath):
-                print(f"({i + 1}) Skipping {follower_username} (already downloaded).")
-                continue
-
-            print(f"({i + 1}) Downloading profile for {follower_username}...")
-
-            try:
-                response = requests.get(image_url, stream=True)
-                response.raise_for_status()
-
-                with open(filepath, 'wb') as f:
-                    for chunk in response.iter_content(chunk_size=8192):
-                        f.write(chunk)
-                downloaded_count += 1
+        # The follower list is collected first so the avatars can be
+        # downloaded concurrently afterwards. Followers already in the
+        # folder's manifest are skipped by the downloader.
+        jobs = [(follower.username, follower.avatar_larger)
+                for follower in user.followers(count=MAX_FOLLOWERS_TO_FETCH)]
 
-            except requests.exceptions.RequestException as e:
-                print(f"    - Could not download image for {follower_username}: {e}")
-            except Exception as e:
-                print(f"    - An error occurred while saving the file for {follower_username}: {e}")
+        print(f"Downloading {len(jobs)} profile pictures...")
+        counts = AvatarDownloader(SKINS_FOLDER, max_workers=DOWNLOAD_WORKERS).download(jobs)
 
     except Exception as e:
         print("\n" + "=" * 30)
@@ -80,7 +56,8 @@ def download_profile_pictures(username):
 
     print("\n" + "-" * 30)
     print("Process finished.")
-    print(f"Successfully downloaded {downloaded_count} new profile pictures.")
+    print(f"Successfully downloaded {counts['downloaded']} new profile pictures "
+          f"({counts['skipped']} skipped, {counts['failed']} failed).")
     print(f"Files are saved in the '{SKINS_FOLDER}' folder.")
 
 
@@ -0,0 +1,137 @@
+import argparse
+import math
+import rng
+from ball_field import BallField
+from map_compiler import load_compiled_map, load_map_module
+from map_index import MapIndex
+from replay import ReplayRecorder
+from race import retire_finished, spawn_balls, step_physics
+from ranking import RaceRanking
+from spatial_grid import SpatialGrid
+from skin_atlas import load_race_skins
+
+# Upper bound on race length; at 60 ticks per second this is five minutes.
+MAX_TICKS = 60 * 60 * 5
+# 'balls' steps one Ball object at a time; 'field' steps the whole field in
+# NumPy arrays (see ball_field.py). Both give the same race.
+ENGINES = ('balls', 'field')
+
+
+def simulate_race(map_module, seed, map_kwargs=None, ball_skins=None, new_ball_skins=None, max_ticks=MAX_TICKS,
+                  record_path=None, dt=None, engine='balls'):
+    """
+    Runs a race headlessly, as fast as the CPU allows.
+    Balls and the map are built in the same order as start_race in main.py,
+    then physics is stepped without a display, mixer or any drawing until
+    every ball has crossed the finish line, the rest have all come to rest
+    for good (see Ball.settle), or max_ticks is reached.
+    Every subsystem draws from its own stream seeded from seed, so the same
+    arguments always produce the same race. With record_path set the race is
+    also written out as a replay (see replay.py).
+
+    With dt set, each physics step covers dt frames using adaptive substeps
+    and swept collisions, which is quicker for large dt. Ticks are still
+    counted in 60 Hz frames, so results stay comparable with dt=None. Replays
+    are only recorded at one step per frame.
+
+    engine picks how balls are stepped, one of ENGINES. The 'field' engine
+    only takes the plain one frame step.
+
+    Returns a dictionary with the winner, the finishing order as
+    (ball, tick) tuples, the tick count, the full list of balls with their
+    spawn x positions, and the map's named sections.
+    """
+    if record_path and dt is not None:
+        raise ValueError("Replays are recorded one frame per step; record without dt.")
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine '{engine}', expected one of {ENGINES}")
+    if engine == 'field' and dt is not None:
+        raise ValueError("The field engine steps one frame at a time; run it without dt.")
+    map_module = load_map_module(map_module)
+    rng.seed_streams(seed)
+
+    if ball_skins is None or new_ball_skins is None:
+        loaded_skins, loaded_new_skins = load_race_skins()
+        ball_skins = loaded_skins if ball_skins is None else ball_skins
+        new_ball_skins = loaded_new_skins if new_ball_skins is None else new_ball_skins
+
+    balls = spawn_balls(ball_skins, new_ball_skins)
+    spawn_x = [ball.x for ball in balls]
+    field = None
+    if engine == 'field':
+        field = BallField(balls)
+        balls = field.balls
+    compiled_map = load_compiled_map(map_module, seed, map_kwargs)
+    ramps, obstacles, finish_line_props = compiled_map.build()
+    map_index = MapIndex(ramps, obstacles, geometry=compiled_map.geometry())
+    grid = SpatialGrid()
+    finish_y = finish_line_props.get('y')
+
+    recorder = None
+    if record_path:
+        recorder = ReplayRecorder(record_path, seed, map_module.__name__, map_kwargs,
+                                  [ball.username for ball in balls])
+        recorder.record(balls)
+
+    # Only the finishing order is needed here, so the running order is never re-sorted.
+    ranking = RaceRanking(balls)
+    finishing_order = ranking.finished
+    steps = 0
+    ticks = 0
+    quiet_ticks = 0
+    while len(finishing_order) < len(balls) and ticks < max_ticks:
+        # Particles have no effect on the outcome, so none are emitted.
+        step_physics(balls, None, obstacles, ramps, map_index, grid, dt=dt, field=field)
+        steps += 1
+        ticks = steps if dt is None else round(steps * dt)
+        if recorder:
+            recorder.record(balls)
+
+        if finish_y:
+            ranking.record_finishes(retire_finished(balls, finish_y), ticks)
+        # Once every ball left is asleep and their cycles have all come round
+        # together without a contact, the race can only repeat itself.
+        sleepers = [ball for ball in balls if not ball.retired]
+        if all(ball.asleep for ball in sleepers):
+            quiet_ticks += 1
+            if quiet_ticks >= math.lcm(*(ball.sleep_period for ball in sleepers)):
+                break
+        else:
+            quiet_ticks = 0
+
+    if recorder:
+        index_of = {id(ball): i for i, ball in enumerate(balls)}
+        recorder.close({'finishing_order': [[index_of[id(ball)], tick] for ball, tick in finishing_order]})
+
+    return {
+        'winner': finishing_order[0][0] if finishing_order else None,
+        'finishing_order': finishing_order,
+        'ticks': ticks,
+        'balls': balls,
+        'spawn_x': spawn_x,
+        'sections': finish_line_props.get('sections', []),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a race headlessly and print the result.")
+    parser.add_argument("map_module", nargs="?", default="map", help="e.g. 'map' or 'maps.map2'")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--difficulty", help="only for maps that take a difficulty, e.g. maps.map2")
+    parser.add_argument("--record", help="write a replay of the race to this file")
+    parser.add_argument("--dt", type=float, help="frames per physics step, with adaptive substeps")
+    parser.add_argument("--engine", choices=ENGINES, default='balls')
+    args = parser.parse_args()
+
+    kwargs = {'difficulty': args.difficulty} if args.difficulty else {}
+    result = simulate_race(args.map_module, args.seed, kwargs, record_path=args.record, dt=args.dt,
+                           engine=args.engine)
+
+    print(f"Finished in {result['ticks']} ticks.")
+    if result['winner']:
+        print(f"Winner: {result['winner'].username}")
+    for place, (ball, tick) in enumerate(result['finishing_order'], start=1):
+        print(f"{place:>4}. {ball.username} (tick {tick})")
+    unfinished = len(result['balls']) - len(result['finishing_order'])
+    if unfinished:
+        print(f"{unfinished} balls did not finish.")
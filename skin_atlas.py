@@ -0,0 +1,211 @@
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy
+import pygame
+from utils import BALL_RADIUS, SKIN_FORMATS, crop_skin, skin_users
+
+SKIN_CACHE_DIR = '.skin_cache'
+# Bump when the cropping changes so old atlases are rebuilt.
+ATLAS_VERSION = 1
+SKIN_SIZE = BALL_RADIUS * 2
+# Below this many files to decode, starting worker processes costs more than it saves.
+PARALLEL_DECODE_MIN = 16
+
+
+class SkinAtlas:
+    """
+    On-disk cache of the cropped ball skins for one folder.
+    Every skin is stored already scaled and cut to a circle, one RGBA row per
+    image file in a single .npy atlas, next to an index of file stats and
+    content hashes; self.index maps each username to its atlas row. A warm
+    start is one memory-mapped read of the atlas; only files that were added
+    or changed since the last run get decoded, spread over a process pool
+    when there are many of them.
+    """
+
+    def __init__(self, folder_path='skins', cache_dir=SKIN_CACHE_DIR):
+        self.folder_path = folder_path
+        # One cache per folder, named so it is still readable on disk.
+        folder_hash = hashlib.sha1(os.path.abspath(folder_path).encode()).hexdigest()[:12]
+        cache_path = os.path.join(cache_dir, f"{os.path.basename(os.path.normpath(folder_path))}-{folder_hash}")
+        self.atlas_path = cache_path + '.npy'
+        self.index_path = cache_path + '.json'
+        self.entries = []
+        self.pixels = numpy.zeros((0, SKIN_SIZE, SKIN_SIZE, 4), dtype=numpy.uint8)
+        self.index = {}
+        self.decoded = 0
+        self.refresh()
+
+    def _read_cache(self):
+        try:
+            with open(self.index_path) as f:
+                index = json.load(f)
+            if index.get('version') != ATLAS_VERSION or not index['entries']:
+                return [], None
+            pixels = numpy.load(self.atlas_path, mmap_mode='r')
+        except (OSError, ValueError, KeyError):
+            return [], None
+        if pixels.shape != (len(index['entries']), SKIN_SIZE, SKIN_SIZE, 4):
+            return [], None
+        return index['entries'], pixels
+
+    def _write_cache(self):
+        os.makedirs(os.path.dirname(self.atlas_path) or '.', exist_ok=True)
+        # Written to temporary files and swapped in, so an interrupted run
+        # never leaves a half-written atlas behind. The names carry the pid so
+        # processes refreshing the same folder never write into each other's file.
+        suffix = f'.{os.getpid()}.tmp'
+        with open(self.atlas_path + suffix, 'wb') as f:
+            numpy.save(f, self.pixels)
+        os.replace(self.atlas_path + suffix, self.atlas_path)
+        with open(self.index_path + suffix, 'w') as f:
+            json.dump({'version': ATLAS_VERSION, 'entries': self.entries}, f)
+        os.replace(self.index_path + suffix, self.index_path)
+
+    def refresh(self):
+        """Brings the atlas up to date with the folder, decoding only what changed."""
+        if not os.path.exists(self.folder_path):
+            print(f"Warning: The '{self.folder_path}' folder was not found.")
+            return
+
+        cached_entries, cached_pixels = self._read_cache()
+        by_stat = {(e['filename'], e['size'], e['mtime_ns']): i for i, e in enumerate(cached_entries)}
+        by_hash = {e['sha1']: i for i, e in enumerate(cached_entries)}
+
+        entries = []
+        rows = []
+        pending = []
+        changed = False
+        # Sorted, so skins come back in the same order on every platform.
+        for filename in sorted(os.listdir(self.folder_path)):
+            if not filename.lower().endswith(SKIN_FORMATS):
+                continue
+            path = os.path.join(self.folder_path, filename)
+            stat = os.stat(path)
+            entry = {
+                'filename': filename,
+                'size': stat.st_size,
+                'mtime_ns': stat.st_mtime_ns,
+            }
+
+            cached = by_stat.get((filename, stat.st_size, stat.st_mtime_ns))
+            if cached is not None:
+                entry['sha1'] = cached_entries[cached]['sha1']
+                row = cached_pixels[cached]
+            else:
+                # The file is new or was touched; its content hash decides
+                # whether it really needs decoding again.
+                changed = True
+                with open(path, 'rb') as f:
+                    data = f.read()
+                entry['sha1'] = hashlib.sha1(data).hexdigest()
+                cached = by_hash.get(entry['sha1'])
+                if cached is not None:
+                    row = cached_pixels[cached]
+                else:
+                    row = None
+                    pending.append((len(rows), data, filename))
+            entries.append(entry)
+            rows.append(row)
+
+        # Results come back in the order they were submitted, so the atlas
+        # layout never depends on which worker finished first.
+        failed = set()
+        for (position, data, filename), (row, error) in zip(pending, decode_all(pending)):
+            if error:
+                print(f"Could not load image '{filename}': {error}")
+                failed.add(position)
+            rows[position] = row
+        self.decoded += len(pending) - len(failed)
+        if failed:
+            entries = [entry for i, entry in enumerate(entries) if i not in failed]
+            rows = [row for i, row in enumerate(rows) if i not in failed]
+
+        self.entries = entries
+        rows_by_file = {entry['filename']: i for i, entry in enumerate(entries)}
+        self.index = {
+            username: rows_by_file[filename]
+            for username, filename in skin_users(self.folder_path) if filename in rows_by_file
+        }
+        if not changed and len(entries) == len(cached_entries):
+            self.pixels = cached_pixels if cached_pixels is not None else self.pixels
+            return
+        if rows:
+            self.pixels = numpy.stack(rows)
+        else:
+            self.pixels = numpy.zeros((0, SKIN_SIZE, SKIN_SIZE, 4), dtype=numpy.uint8)
+        # Rows are copied out above; release the old mapping so the atlas
+        # file can be replaced (Windows refuses while it is mapped).
+        del rows, cached_pixels
+        self._write_cache()
+
+    def skins(self):
+        """
+        Returns the skins in the same {'surface', 'username'} form as
+        utils.load_skins. The whole atlas becomes one surface, and each image
+        is a subsurface of it, shared by every user that has that image.
+        """
+        if not self.entries:
+            return []
+        strip = numpy.ascontiguousarray(self.pixels).reshape(len(self.entries) * SKIN_SIZE, SKIN_SIZE, 4)
+        atlas = pygame.image.frombytes(strip.tobytes(), (SKIN_SIZE, len(self.entries) * SKIN_SIZE), 'RGBA')
+        if pygame.display.get_surface() is not None:
+            atlas = atlas.convert_alpha()
+        surfaces = {
+            entry['filename']: atlas.subsurface((0, i * SKIN_SIZE, SKIN_SIZE, SKIN_SIZE))
+            for i, entry in enumerate(self.entries)
+        }
+        return [
+            {'surface': surfaces[filename], 'username': username}
+            for username, filename in skin_users(self.folder_path) if filename in surfaces
+        ]
+
+
+def decode_skin(job):
+    """
+    Decodes, scales and crops one image file's bytes into an RGBA pixel
+    array. Returns (pixels, None), or (None, message) if it can't be read.
+    Runs in worker processes, so it only touches raw buffers, never the display.
+    """
+    _, data, filename = job
+    try:
+        image = pygame.image.load(io.BytesIO(data), filename)
+    except pygame.error as e:
+        return None, str(e)
+    pixels = numpy.frombuffer(pygame.image.tobytes(crop_skin(image), 'RGBA'), dtype=numpy.uint8)
+    return pixels.reshape(SKIN_SIZE, SKIN_SIZE, 4), None
+
+
+def decode_all(jobs):
+    """Decodes the jobs across every core, yielding results in job order."""
+    # Pool workers are daemonic and may not start processes of their own.
+    if len(jobs) < PARALLEL_DECODE_MIN or multiprocessing.current_process().daemon:
+        yield from map(decode_skin, jobs)
+        return
+    workers = os.cpu_count() or 1
+    with ProcessPoolExecutor(workers) as pool:
+        yield from pool.map(decode_skin, jobs, chunksize=max(1, len(jobs) // (workers * 4)))
+
+
+def refresh_race_skins():
+    """
+    Brings both skin atlases up to date without building any surfaces.
+    Call it before starting a process pool whose workers load skins, so the
+    workers find a warm cache and only map it instead of decoding.
+    """
+    SkinAtlas('skins')
+    SkinAtlas('new_skins')
+
+
+def load_race_skins():
+    """
+    Loads both skin folders once and returns (ball_skins, new_ball_skins):
+    every skin, and the new followers on their own.
+    """
+    skins = SkinAtlas('skins').skins()
+    new_skins = SkinAtlas('new_skins').skins()
+    return skins + new_skins, new_skins
@@ -0,0 +1,52 @@
+import math
+from utils import BALL_RADIUS
+
+# Only half of the 3x3 neighbourhood is visited from each cell so that every
+# pair of neighbouring cells is checked exactly once.
+NEIGHBOUR_OFFSETS = ((1, 0), (-1, 1), (0, 1), (1, 1))
+
+
+class SpatialGrid:
+    """Uniform grid broadphase that buckets balls by position."""
+
+    def __init__(self, cell_size=BALL_RADIUS * 2):
+        # A cell as wide as a ball means touching balls are always in the same
+        # cell or in directly neighbouring ones.
+        self.cell_size = cell_size
+        self.cells = {}
+
+    def rebuild(self, balls):
+        """Re-bucket every ball by the cell its centre falls in."""
+        self.cells.clear()
+        cell_size = self.cell_size
+        for i, ball in enumerate(balls):
+            key = (math.floor(ball.x / cell_size), math.floor(ball.y / cell_size))
+            bucket = self.cells.get(key)
+            if bucket is None:
+                self.cells[key] = [i]
+            else:
+                bucket.append(i)
+
+    def candidate_pairs(self):
+        """
+        Returns the (i, j) index pairs of balls in the same or neighbouring cells,
+        with i < j, sorted the same way the old full double loop visited them.
+        """
+        pairs = []
+        cells = self.cells
+        for (cx, cy), bucket in cells.items():
+            for a in range(len(bucket)):
+                for b in range(a + 1, len(bucket)):
+                    i, j = bucket[a], bucket[b]
+                    pairs.append((i, j) if i < j else (j, i))
+
+            for ox, oy in NEIGHBOUR_OFFSETS:
+                other = cells.get((cx + ox, cy + oy))
+                if other is None:
+                    continue
+                for i in bucket:
+                    for j in other:
+                        pairs.append((i, j) if i < j else (j, i))
+
+        pairs.sort()
+        return pairs
@@ -0,0 +1,141 @@
+import math
+from utils import BALL_RADIUS
+
+# A ball moving at most this far per step can't pass through a ramp or a
+# thin obstacle unnoticed: it always ends up overlapping anything it crossed,
+# and the discrete collision test pushes it back out on the side it came from.
+SAFE_TRAVEL = BALL_RADIUS
+# Faster balls are split into substeps of at most this much travel, each swept
+# for its time of impact.
+MAX_SUBSTEP_TRAVEL = BALL_RADIUS * 4
+MAX_SUBSTEPS = 8
+# Surface contacts handled within one substep before the rest of it is dropped.
+MAX_CONTACTS = 4
+# How far short of the exact time of impact a ball stops, so it is left just
+# outside the surface instead of exactly on it.
+CONTACT_SLOP = 1e-6
+
+
+def _circle_toi(px, py, dx, dy, cx, cy, radius):
+    """Earliest t in [0, 1] at which p + t*d comes within radius of c, or None."""
+    fx = px - cx
+    fy = py - cy
+    a = dx * dx + dy * dy
+    c = fx * fx + fy * fy - radius * radius
+    b = fx * dx + fy * dy
+    # Not moving, already touching, or moving away.
+    if a == 0 or c < 0 or b >= 0:
+        return None
+    discriminant = b * b - a * c
+    if discriminant < 0:
+        return None
+    t = (-b - math.sqrt(discriminant)) / a
+    return t if t <= 1 else None
+
+
+def capsule_toi(ax, ay, bx, by, px, py, dx, dy, radius):
+    """
+    Time of impact in [0, 1] of a circle of the given radius moving from p by
+    d against the segment a-b, or None if it doesn't hit it on the way.
+    Circles that already overlap the segment are left to the discrete test.
+    """
+    ex = bx - ax
+    ey = by - ay
+    length_sq = ex * ex + ey * ey
+    if length_sq == 0:
+        return _circle_toi(px, py, dx, dy, ax, ay, radius)
+
+    # Against the flat sides, at radius from the segment's line...
+    length = math.sqrt(length_sq)
+    nx = -ey / length
+    ny = ex / length
+    s0 = (px - ax) * nx + (py - ay) * ny
+    s1 = s0 + dx * nx + dy * ny
+    if abs(s0) >= radius:
+        side = radius if s0 > 0 else -radius
+        if (s0 - side) * (s1 - side) <= 0 and s0 != s1:
+            t = (s0 - side) / (s0 - s1)
+            along = ((px + t * dx - ax) * ex + (py + t * dy - ay) * ey) / length_sq
+            if 0 <= along <= 1:
+                return t
+
+    # ...otherwise against the round ends.
+    hits = [t for t in (_circle_toi(px, py, dx, dy, ax, ay, radius), _circle_toi(px, py, dx, dy, bx, by, radius))
+            if t is not None]
+    return min(hits) if hits else None
+
+
+def ramp_toi(ramp, px, py, dx, dy, radius):
+    return capsule_toi(ramp.p1.x, ramp.p1.y, ramp.p2.x, ramp.p2.y, px, py, dx, dy, radius)
+
+
+def obstacle_toi(obstacle, px, py, dx, dy, radius):
+    """A rectangle grown by radius is the union of capsules around its four edges."""
+    left, top, right, bottom = obstacle.rect.left, obstacle.rect.top, obstacle.rect.right, obstacle.rect.bottom
+    hits = [t for t in (
+        capsule_toi(left, top, right, top, px, py, dx, dy, radius),
+        capsule_toi(right, top, right, bottom, px, py, dx, dy, radius),
+        capsule_toi(right, bottom, left, bottom, px, py, dx, dy, radius),
+        capsule_toi(left, bottom, left, top, px, py, dx, dy, radius),
+    ) if t is not None]
+    return min(hits) if hits else None
+
+
+def _closest_on_obstacle(obstacle, x, y):
+    return max(obstacle.rect.left, min(x, obstacle.rect.right)), max(obstacle.rect.top, min(y, obstacle.rect.bottom))
+
+
+def _closest_on_ramp(ramp, x, y):
+    t = ((x - ramp.p1.x) * ramp.direction.x + (y - ramp.p1.y) * ramp.direction.y) / ramp.length_sq
+    t = max(0, min(1, t))
+    return ramp.p1.x + t * ramp.direction.x, ramp.p1.y + t * ramp.direction.y
+
+
+def sweep_move(ball, obstacles, ramps, dt):
+    """
+    Moves the ball along its velocity for dt, stopping at the first ramp or
+    obstacle in the way, bouncing off it, and carrying on for the time left.
+    """
+    remaining = dt
+    radius = ball.radius
+    for _ in range(MAX_CONTACTS):
+        dx = ball.vx * remaining
+        dy = ball.vy * remaining
+        # Box around the whole swept circle, for a cheap first rejection.
+        left = min(ball.x, ball.x + dx) - radius
+        right = max(ball.x, ball.x + dx) + radius
+        top = min(ball.y, ball.y + dy) - radius
+        bottom = max(ball.y, ball.y + dy) + radius
+
+        first, first_t, closest = None, 2.0, None
+        for obstacle in obstacles:
+            rect = obstacle.rect
+            if rect.left > right or rect.right < left or rect.top > bottom or rect.bottom < top:
+                continue
+            t = obstacle_toi(obstacle, ball.x, ball.y, dx, dy, radius)
+            if t is not None and t < first_t:
+                first, first_t, closest = obstacle, t, _closest_on_obstacle
+        for ramp in ramps:
+            if ramp.length_sq == 0:
+                continue
+            aabb = ramp.aabb
+            if aabb[0] > right or aabb[2] < left or aabb[1] > bottom or aabb[3] < top:
+                continue
+            t = ramp_toi(ramp, ball.x, ball.y, dx, dy, radius)
+            if t is not None and t < first_t:
+                first, first_t, closest = ramp, t, _closest_on_ramp
+
+        if first is None:
+            ball.x += dx
+            ball.y += dy
+            return
+
+        t = max(0.0, first_t - CONTACT_SLOP)
+        ball.x += dx * t
+        ball.y += dy * t
+        # Bounce off the surface normal at the point of contact.
+        closest_x, closest_y = closest(first, ball.x, ball.y)
+        distance = math.hypot(ball.x - closest_x, ball.y - closest_y)
+        if distance > 0:
+            first.bounce(ball, (ball.x - closest_x) / distance, (ball.y - closest_y) / distance)
+        remaining *= 1 - t
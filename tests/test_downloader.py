@@ -0,0 +1,127 @@
+import io
+import json
+import os
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pygame
+import pytest
+from downloader import AvatarDownloader
+from utils import SKIN_MANIFEST
+
+
+def png_bytes(color):
+    image = pygame.Surface((64, 64))
+    image.fill(color)
+    encoded = io.BytesIO()
+    pygame.image.save(image, encoded, 'avatar.png')
+    return encoded.getvalue()
+
+
+RED = png_bytes((255, 0, 0))
+BLUE = png_bytes((0, 0, 255))
+
+
+class StandInServer:
+    """
+    Local HTTP server serving fixture avatars. Each path has a script of
+    (status, headers) responses played in order; once it runs out, the
+    avatar itself is served.
+    """
+
+    def __init__(self, avatars, scripts):
+        self.avatars = avatars
+        self.scripts = {path: list(script) for path, script in scripts.items()}
+        self.hits = Counter()
+        self.lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                with server.lock:
+                    server.hits[self.path] += 1
+                    script = server.scripts.get(self.path)
+                    scripted = script.pop(0) if script else None
+                if scripted is not None:
+                    status, headers = scripted
+                elif self.path in server.avatars:
+                    status, headers = 200, {'Content-Type': 'image/png'}
+                else:
+                    status, headers = 404, {}
+                body = server.avatars[self.path] if status == 200 else b''
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def server():
+    avatars = {'/red.png': RED, '/blue.png': BLUE, '/red-copy.png': RED, '/shared.png': BLUE}
+    scripts = {
+        '/red.png': [(429, {'Retry-After': '0.3'})],
+        '/blue.png': [(503, {}), (503, {})],
+        '/gone.png': [(404, {})],
+    }
+    with StandInServer(avatars, scripts) as stand_in:
+        yield stand_in
+
+
+def test_download_retries_dedupes_and_resumes(server, tmp_path):
+    folder = str(tmp_path / 'skins')
+    jobs = [
+        ('red', server.url + '/red.png'),
+        ('blue', server.url + '/blue.png'),
+        ('red_again', server.url + '/red-copy.png'),
+        ('gone', server.url + '/gone.png'),
+    ]
+    # Many users sharing one avatar, fetched at the same time.
+    jobs += [(f"fan{i}", server.url + '/shared.png') for i in range(12)]
+
+    started = time.monotonic()
+    counts = AvatarDownloader(folder, max_workers=8, retries=3, backoff=0.01).download(jobs)
+    elapsed = time.monotonic() - started
+
+    assert counts == {'downloaded': 15, 'skipped': 0, 'failed': 1}
+    # The 429 was waited out for its Retry-After, and each 503 retried.
+    assert elapsed >= 0.3
+    assert server.hits['/red.png'] == 2
+    assert server.hits['/blue.png'] == 3
+    assert server.hits['/gone.png'] == 1
+
+    with open(os.path.join(folder, SKIN_MANIFEST)) as f:
+        users = json.load(f)['users']
+    assert set(users) == {name for name, _ in jobs} - {'gone'}
+    assert users['red']['url'] == server.url + '/red.png'
+    assert users['red']['image'] == users['red_again']['image']
+    assert users['blue']['image'] != users['red']['image']
+    assert {users[f"fan{i}"]['image'] for i in range(12)} == {users['blue']['image']}
+
+    # Identical avatars share one file, and no temporary files are left over.
+    assert sorted(os.listdir(folder)) == sorted([SKIN_MANIFEST, users['red']['image'], users['blue']['image']])
+    for image in (users['red']['image'], users['blue']['image']):
+        pygame.image.load(os.path.join(folder, image))
+
+    # A second run picks up from the manifest and only retries the failure.
+    hits_before = sum(server.hits.values())
+    counts = AvatarDownloader(folder, max_workers=8, retries=3, backoff=0.01).download(jobs)
+    assert counts == {'downloaded': 0, 'skipped': 15, 'failed': 1}
+    assert sum(server.hits.values()) - hits_before == 1
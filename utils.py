@@ -1,5 +1,7 @@
 import pygame
+import json
 import os
+from functools import lru_cache
 
 # --- Screen and Display ---
 SCREEN_WIDTH = 480
@@ -19,54 +21,107 @@ CONFETTI_COLORS = [
 GRAVITY = 0.13
 FRICTION = 0.85
 BALL_RADIUS = 15
-NUM_BALLS = len(os.listdir('skins'))
-NUM_NEW_BALLS = len(os.listdir('new_skins'))
+
+# --- Skins ---
+SKIN_FORMATS = ('.png', '.jpg', '.jpeg')
+# Written by downloader.py; maps each username to its (shared) image file.
+SKIN_MANIFEST = 'manifest.json'
+
+
+def skin_users(folder_path):
+    """
+    Returns (username, filename) pairs for a skin folder, sorted by username.
+    Users in the folder's manifest point at deduplicated images; any other
+    image in the folder is a skin of its own, named after the file.
+    """
+    if not os.path.exists(folder_path):
+        return []
+    try:
+        with open(os.path.join(folder_path, SKIN_MANIFEST)) as f:
+            users = {username: entry['image'] for username, entry in json.load(f).get('users', {}).items()}
+    except (OSError, ValueError, KeyError):
+        users = {}
+
+    shared = set(users.values())
+    for filename in os.listdir(folder_path):
+        if filename.lower().endswith(SKIN_FORMATS) and filename not in shared:
+            users.setdefault(os.path.splitext(filename)[0], filename)  # Get username from filename
+    return sorted(users.items())
+
+
+NUM_BALLS = len(skin_users('skins'))
+NUM_NEW_BALLS = len(skin_users('new_skins'))
 
 
 def load_texture(filename, folder='assets'):
-    """Loads a single texture image from the assets folder."""
+    """
+    Loads a single texture image from the assets folder.
+    Textures are cached, so restarting a race doesn't decode them again;
+    callers must not draw onto the returned surface.
+    """
+    # Converted and headless copies are cached separately.
+    return _load_texture(filename, folder, pygame.display.get_surface() is not None)
+
+
+@lru_cache(maxsize=None)
+def _load_texture(filename, folder, convert):
     path = os.path.join(folder, filename)
     if not os.path.exists(path):
         print(f"Error: Texture file not found at '{path}'")
         return None
     try:
-        texture = pygame.image.load(path).convert_alpha()
+        texture = pygame.image.load(path)
+        # Headless runs have no display to convert for.
+        if convert:
+            texture = texture.convert_alpha()
         return texture
     except pygame.error as e:
         print(f"Could not load texture '{filename}': {e}")
         return None
 
 
+def crop_skin(image):
+    """Scales an avatar image to ball size and cuts it to a circle."""
+    scaled_image = pygame.transform.scale(image, (BALL_RADIUS * 2, BALL_RADIUS * 2))
+
+    circle_surface = pygame.Surface((BALL_RADIUS * 2, BALL_RADIUS * 2), pygame.SRCALPHA)
+    pygame.draw.circle(circle_surface, (255, 255, 255), (BALL_RADIUS, BALL_RADIUS), BALL_RADIUS)
+    circle_surface.blit(scaled_image, (0, 0), special_flags=pygame.BLEND_RGBA_MULT)
+    return circle_surface
+
+
 def load_skins(folder_path='skins'):
-    """Loads all supported image types from a specified folder and crops them."""
+    """
+    Loads all supported image types from a specified folder and crops them.
+    This decodes every file on each call; skin_atlas.py keeps the cropped
+    results cached on disk.
+    """
     skins = []
     if not os.path.exists(folder_path):
         print(f"Warning: The '{folder_path}' folder was not found.")
         return skins
 
-    supported_formats = ('.png', '.jpg', '.jpeg')
-    for filename in os.listdir(folder_path):
-        if filename.lower().endswith(supported_formats):
+    # Users sharing an image share one surface too.
+    surfaces = {}
+    for username, filename in skin_users(folder_path):
+        if filename not in surfaces:
             try:
-                path = os.path.join(folder_path, filename)
-                image = pygame.image.load(path)
-                username = os.path.splitext(filename)[0]  # Get username from filename
+                image = pygame.image.load(os.path.join(folder_path, filename))
 
-                if filename.lower().endswith('.png'):
+                if pygame.display.get_surface() is None:
+                    pass  # Headless runs have no display to convert for.
+                elif filename.lower().endswith('.png'):
                     image = image.convert_alpha()
                 else:
                     image = image.convert()
+                surfaces[filename] = crop_skin(image)
 
-                scaled_image = pygame.transform.scale(image, (BALL_RADIUS * 2, BALL_RADIUS * 2))
-
-                circle_surface = pygame.Surface((BALL_RADIUS * 2, BALL_RADIUS * 2), pygame.SRCALPHA)
-                pygame.draw.circle(circle_surface, (255, 255, 255), (BALL_RADIUS, BALL_RADIUS), BALL_RADIUS)
-                circle_surface.blit(scaled_image, (0, 0), special_flags=pygame.BLEND_RGBA_MULT)
-
-                # Store the surface and the username together
-                skins.append({'surface': circle_surface, 'username': username})
-
-            except pygame.error as e:
+            except (pygame.error, FileNotFoundError) as e:
                 print(f"Could not load image '{filename}': {e}")
+                surfaces[filename] = None
+
+        # Store the surface and the username together
+        if surfaces[filename] is not None:
+            skins.append({'surface': surfaces[filename], 'username': username})
 
     return skins